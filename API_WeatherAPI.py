@@ -5,13 +5,23 @@ Script para obtener datos meteorológicos de Bucaramanga usando WeatherAPI
 Fecha: 2025-10-20
 """
 
-import requests
+import argparse
 import pandas as pd
 from datetime import datetime, timedelta
 import time
 
+from perfilado import etapa, perfilar
+from trafico_weatherapi import GrabadorTrafico, cargar_trafico, reproducir_respuesta
+from variables_derivadas import UNIDADES_DERIVADAS, calcular_derivadas
+
+# URL base de WeatherAPI
+URL_BASE = "http://api.weatherapi.com/v1/history.json"
+
+@perfilar()
 def obtener_datos_meteorologicos(api_key, ciudad="Bucaramanga", lat=7.1193, lon=-73.1227, 
-                                 fecha_inicio=None, fecha_fin=None):
+                                 fecha_inicio=None, fecha_fin=None, base_url=URL_BASE,
+                                 pausa=0.5, espera_rate_limit=60, grabar=None, reproducir=None,
+                                 derivadas=None):
     """
     Obtiene datos meteorológicos horarios usando WeatherAPI
     
@@ -22,6 +32,12 @@ def obtener_datos_meteorologicos(api_key, ciudad="Bucaramanga", lat=7.1193, lon=
         lon (float): Longitud
         fecha_inicio (datetime): Fecha de inicio
         fecha_fin (datetime): Fecha de fin
+        base_url (str): URL del endpoint history.json (permite usar un servidor local)
+        pausa (float): Segundos de espera entre solicitudes
+        espera_rate_limit (float): Segundos de espera tras una respuesta 429
+        grabar (str): Ruta de un log JSONL (o .zst) donde agregar cada solicitud/respuesta
+        reproducir (str): Ruta de un log grabado; las respuestas se sirven desde él sin red
+        derivadas (bool | list): Variables derivadas a agregar (True = todas las disponibles)
     
     Returns:
         DataFrame: Datos meteorológicos en formato compatible con API_meteostat.py
@@ -40,10 +56,25 @@ def obtener_datos_meteorologicos(api_key, ciudad="Bucaramanga", lat=7.1193, lon=
     print(f"Coordenadas: Lat {lat}, Lon {lon}")
     print(f"Período: {fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}")
     print("Intervalo: Cada hora")
+    if reproducir:
+        print(f"Modo: reproducción desde {reproducir}")
+    elif grabar:
+        print(f"Modo: grabación en {grabar}")
     print("-" * 60)
     
-    # URL base de WeatherAPI
-    base_url = "http://api.weatherapi.com/v1/history.json"
+    # En modo reproducción todo el log se carga en memoria y no se espera entre solicitudes
+    trafico = None
+    if reproducir:
+        try:
+            trafico = cargar_trafico(reproducir)
+        except (FileNotFoundError, ImportError) as e:
+            print(f"❌ Error: {e}")
+            return None
+        pausa = 0
+    else:
+        # requests sólo se necesita cuando hay red de por medio
+        import requests
+    grabador = GrabadorTrafico(grabar) if grabar and not reproducir else None
     
     # Lista para almacenar todos los datos
     todos_los_datos = []
@@ -57,75 +88,109 @@ def obtener_datos_meteorologicos(api_key, ciudad="Bucaramanga", lat=7.1193, lon=
     
     dias_procesados = 0
     
-    while fecha_actual <= fecha_fin:
-        try:
-            # Parámetros de la consulta
-            params = {
-                'key': api_key,
-                'q': f"{lat},{lon}",
-                'dt': fecha_actual.strftime('%Y-%m-%d'),
-                'hour': 'all'  # Obtener todas las horas del día
-            }
+    try:
+        while fecha_actual <= fecha_fin:
+            try:
+                # Parámetros de la consulta
+                params = {
+                    'key': api_key,
+                    'q': f"{lat},{lon}",
+                    'dt': fecha_actual.strftime('%Y-%m-%d'),
+                    'hour': 'all'  # Obtener todas las horas del día
+                }
             
-            # Hacer la solicitud
-            response = requests.get(base_url, params=params)
+                # Hacer la solicitud (o servirla desde el log grabado)
+                with etapa('red'):
+                    if trafico is not None:
+                        response = reproducir_respuesta(trafico, params)
+                    else:
+                        response = requests.get(base_url, params=params)
+                        if grabador is not None:
+                            grabador.registrar(params, response)
             
-            if response.status_code == 200:
-                data = response.json()
+                if response.status_code == 200:
+                    with etapa('parseo'):
+                        data = response.json()
+                    
+                        # Extraer datos horarios
+                        if 'forecast' in data and 'forecastday' in data['forecast']:
+                            for day in data['forecast']['forecastday']:
+                                for hour in day['hour']:
+                                    todos_los_datos.append(extraer_registro(hour))
                 
-                # Extraer datos horarios
-                if 'forecast' in data and 'forecastday' in data['forecast']:
-                    for day in data['forecast']['forecastday']:
-                        for hour in day['hour']:
-                            registro = {
-                                'datetime': datetime.strptime(hour['time'], '%Y-%m-%d %H:%M'),
-                                'temp': hour.get('temp_c'),  # Temperatura en °C
-                                'pressure': hour.get('pressure_mb'),  # Presión en mb (equivalente a hPa)
-                                'humidity': hour.get('humidity'),  # Humedad en %
-                                'dewpoint': hour.get('dewpoint_c'),  # Punto de rocío en °C
-                                'precip': hour.get('precip_mm'),  # Precipitación en mm
-                                'wind_dir': hour.get('wind_degree'),  # Dirección del viento en grados
-                                'wind_speed': hour.get('wind_kph'),  # Velocidad del viento en km/h
-                                'wind_gust': hour.get('gust_kph'),  # Ráfaga de viento en km/h
-                                'condition': hour.get('condition', {}).get('text'),  # Condición del tiempo
-                                'cloud': hour.get('cloud'),  # Nubosidad en %
-                                'feelslike': hour.get('feelslike_c'),  # Sensación térmica en °C
-                                'visibility': hour.get('vis_km'),  # Visibilidad en km
-                                'uv': hour.get('uv')  # Índice UV
-                            }
-                            todos_los_datos.append(registro)
+                    dias_procesados += 1
+                    if dias_procesados % 10 == 0:
+                        print(f"Progreso: {dias_procesados}/{total_dias} días procesados...")
                 
-                dias_procesados += 1
-                if dias_procesados % 10 == 0:
-                    print(f"Progreso: {dias_procesados}/{total_dias} días procesados...")
+                    # Pequeña pausa para evitar límites de rate
+                    if pausa:
+                        time.sleep(pausa)
                 
-                # Pequeña pausa para evitar límites de rate
-                time.sleep(0.5)
-                
-            elif response.status_code == 400:
-                print(f"⚠️  Advertencia: No hay datos disponibles para {fecha_actual.strftime('%Y-%m-%d')}")
-            elif response.status_code == 401:
-                print("❌ Error: API key inválida o no autorizada")
-                return None
-            elif response.status_code == 429:
-                print("⚠️  Límite de rate alcanzado. Esperando 60 segundos...")
-                time.sleep(60)
-                continue  # Reintentar la misma fecha
-            else:
-                print(f"❌ Error al obtener datos para {fecha_actual.strftime('%Y-%m-%d')}: {response.status_code}")
+                elif response.status_code == 400:
+                    print(f"⚠️  Advertencia: No hay datos disponibles para {fecha_actual.strftime('%Y-%m-%d')}")
+                elif response.status_code == 401:
+                    print("❌ Error: API key inválida o no autorizada")
+                    return None
+                elif response.status_code == 429:
+                    print(f"⚠️  Límite de rate alcanzado. Esperando {espera_rate_limit} segundos...")
+                    time.sleep(espera_rate_limit)
+                    continue  # Reintentar la misma fecha
+                else:
+                    print(f"❌ Error al obtener datos para {fecha_actual.strftime('%Y-%m-%d')}: {response.status_code}")
             
-        except Exception as e:
-            print(f"❌ Error al procesar {fecha_actual.strftime('%Y-%m-%d')}: {e}")
+            except Exception as e:
+                print(f"❌ Error al procesar {fecha_actual.strftime('%Y-%m-%d')}: {e}")
         
-        # Avanzar al siguiente día
-        fecha_actual += timedelta(days=1)
+            # Avanzar al siguiente día
+            fecha_actual += timedelta(days=1)
+    finally:
+        if grabador is not None:
+            grabador.cerrar()
+            print(f"✓ {grabador.grabadas} respuestas grabadas en: {grabar}")
     
     if not todos_los_datos:
         print("\n❌ No se obtuvieron datos.")
         return None
     
+    with etapa('dataframe'):
+        df_final = construir_dataframe(todos_los_datos, ciudad)
+    if derivadas:
+        with etapa('derivadas'):
+            df_final = calcular_derivadas(df_final, None if derivadas is True else derivadas)
+    
+    print(f"\n✓ Total de registros obtenidos: {len(df_final)}")
+    print(f"✓ Columnas disponibles: {', '.join(df_final.columns)}")
+    
+    return df_final
+
+def extraer_registro(hour):
+    """
+    Convierte una hora de la respuesta history.json en un registro plano
+    """
+    return {
+        'datetime': datetime.strptime(hour['time'], '%Y-%m-%d %H:%M'),
+        'temp': hour.get('temp_c'),  # Temperatura en °C
+        'pressure': hour.get('pressure_mb'),  # Presión en mb (equivalente a hPa)
+        'humidity': hour.get('humidity'),  # Humedad en %
+        'dewpoint': hour.get('dewpoint_c'),  # Punto de rocío en °C
+        'precip': hour.get('precip_mm'),  # Precipitación en mm
+        'wind_dir': hour.get('wind_degree'),  # Dirección del viento en grados
+        'wind_speed': hour.get('wind_kph'),  # Velocidad del viento en km/h
+        'wind_gust': hour.get('gust_kph'),  # Ráfaga de viento en km/h
+        'condition': hour.get('condition', {}).get('text'),  # Condición del tiempo
+        'cloud': hour.get('cloud'),  # Nubosidad en %
+        'feelslike': hour.get('feelslike_c'),  # Sensación térmica en °C
+        'visibility': hour.get('vis_km'),  # Visibilidad en km
+        'uv': hour.get('uv')  # Índice UV
+    }
+
+def construir_dataframe(registros, ciudad="Bucaramanga"):
+    """
+    Construye el DataFrame final (formato compatible con API_meteostat.py)
+    a partir de los registros extraídos con extraer_registro
+    """
     # Crear DataFrame con el formato de API_meteostat.py
-    df_data = pd.DataFrame(todos_los_datos)
+    df_data = pd.DataFrame(registros)
     
     # Crear DataFrame final con columnas en el orden especificado
     df_final = pd.DataFrame()
@@ -169,11 +234,9 @@ def obtener_datos_meteorologicos(api_key, ciudad="Bucaramanga", lat=7.1193, lon=
     if 'uv' in df_data.columns:
         df_final['Índice UV'] = df_data['uv'].round(1)
     
-    print(f"\n✓ Total de registros obtenidos: {len(df_final)}")
-    print(f"✓ Columnas disponibles: {', '.join(df_final.columns)}")
-    
     return df_final
 
+@perfilar()
 def guardar_excel(df, nombre_archivo='WeatherAPI_Bucaramanga.xlsx'):
     """
     Guarda el DataFrame en formato Excel
@@ -183,21 +246,23 @@ def guardar_excel(df, nombre_archivo='WeatherAPI_Bucaramanga.xlsx'):
         return
     
     try:
-        # Guardar en Excel con formato
-        with pd.ExcelWriter(nombre_archivo, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Datos Meteorológicos')
+        # Guardar en Excel con formato (el tiempo propio de 'openpyxl' es el guardado del archivo)
+        with etapa('openpyxl'), pd.ExcelWriter(nombre_archivo, engine='openpyxl') as writer:
+            with etapa('to_excel'):
+                df.to_excel(writer, index=False, sheet_name='Datos Meteorológicos')
             
             # Obtener el worksheet para aplicar formato
             worksheet = writer.sheets['Datos Meteorológicos']
             
             # Ajustar ancho de columnas
-            for idx, col in enumerate(df.columns, 1):
-                max_length = max(
-                    df[col].astype(str).apply(len).max(),
-                    len(col)
-                ) + 2
-                col_letter = chr(64 + idx) if idx <= 26 else chr(64 + idx // 26) + chr(64 + idx % 26)
-                worksheet.column_dimensions[col_letter].width = min(max_length, 20)
+            with etapa('anchos_columna'):
+                for idx, col in enumerate(df.columns, 1):
+                    max_length = max(
+                        df[col].astype(str).apply(len).max(),
+                        len(col)
+                    ) + 2
+                    col_letter = chr(64 + idx) if idx <= 26 else chr(64 + idx // 26) + chr(64 + idx % 26)
+                    worksheet.column_dimensions[col_letter].width = min(max_length, 20)
         
         print(f"\n✓ Datos guardados exitosamente en: {nombre_archivo}")
         
@@ -244,7 +309,9 @@ def imprimir_unidades(df=None):
         'Nubosidad': '%',
         'Sensación Térmica': '°C',
         'Visibilidad': 'km',
-        'Índice UV': 'índice (adimensional)'
+        'Índice UV': 'índice (adimensional)',
+        # Variables derivadas (opcionales)
+        **UNIDADES_DERIVADAS
     }
 
     print("\n" + "=" * 40)
@@ -274,6 +341,25 @@ def main():
     """
     Función principal
     """
+    parser = argparse.ArgumentParser(description='Extrae datos meteorológicos horarios de WeatherAPI')
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--grabar', metavar='LOG', help='Agregar cada solicitud/respuesta a un log JSONL (.zst para comprimir)')
+    grupo.add_argument('--reproducir', metavar='LOG', help='Servir las respuestas desde un log grabado, sin red ni API key')
+    args = parser.parse_args()
+    
+    # Parámetros de consulta
+    ciudad = "Bucaramanga"
+    lat = 7.1193
+    lon = -73.1227
+    fecha_inicio = datetime(2024, 12, 1)
+    fecha_fin = datetime(2025, 10, 19)
+    
+    if args.reproducir:
+        df = obtener_datos_meteorologicos(None, ciudad, lat, lon, fecha_inicio, fecha_fin,
+                                          reproducir=args.reproducir)
+        mostrar_resultados(df, ciudad)
+        return
+    
     # Solicitar API key
     print("\n" + "=" * 60)
     print("CONFIGURACIÓN DE WEATHERAPI")
@@ -291,16 +377,15 @@ def main():
         print("❌ API key no proporcionada. Saliendo...")
         return
     
-    # Parámetros de consulta
-    ciudad = "Bucaramanga"
-    lat = 7.1193
-    lon = -73.1227
-    fecha_inicio = datetime(2024, 12, 1)
-    fecha_fin = datetime(2025, 10, 19)
-    
     # Obtener datos
-    df = obtener_datos_meteorologicos(api_key, ciudad, lat, lon, fecha_inicio, fecha_fin)
-    
+    df = obtener_datos_meteorologicos(api_key, ciudad, lat, lon, fecha_inicio, fecha_fin,
+                                      grabar=args.grabar)
+    mostrar_resultados(df, ciudad)
+
+def mostrar_resultados(df, ciudad):
+    """
+    Guarda el Excel y muestra un resumen de los datos obtenidos
+    """
     if df is not None:
         # Guardar archivo con formato WeatherAPI_ciudad_fechainicio_fechafin.xlsx
         ciudad_clean = ''.join(c if c.isalnum() or c in ('_', '-') else '_' for c in ciudad).replace(' ', '_')
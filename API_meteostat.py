@@ -6,43 +6,74 @@ Fecha: 2025-10-20
 """
 
 from datetime import datetime
-from meteostat import Point, Hourly
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
+from perfilado import etapa, perfilar
+from variables_derivadas import calcular_derivadas
 
-def obtener_datos_meteorologicos():
+@perfilar()
+def obtener_datos_meteorologicos(ciudad='Bucaramanga', lat=7.1193, lon=-73.1227, alt=959,
+                                 fecha_inicio=None, fecha_fin=None, derivadas=None):
     """
-    Obtiene datos meteorológicos horarios de Bucaramanga usando Meteostat
+    Obtiene datos meteorológicos horarios usando Meteostat
+    
+    Args:
+        ciudad (str): Nombre de la ciudad
+        lat (float): Latitud
+        lon (float): Longitud
+        alt (float): Altitud en metros
+        fecha_inicio (datetime): Fecha de inicio
+        fecha_fin (datetime): Fecha de fin
+        derivadas (bool | list): Variables derivadas a agregar (True = todas las disponibles)
     """
+    # meteostat es pesado de importar; sólo se carga cuando realmente se consulta
+    from meteostat import Point, Hourly
     
-    # Coordenadas de Bucaramanga, Colombia
+    # Coordenadas por defecto: Bucaramanga, Colombia
     # Latitud: 7.1193, Longitud: -73.1227, Altitud: 959 metros
-    bucaramanga = Point(7.1193, -73.1227, 959)
+    punto = Point(lat, lon, alt)
     
-    # Definir período de tiempo
-    fecha_inicio = datetime(2024, 12, 1)
-    fecha_fin = datetime(2025, 10, 19)
+    # Definir período de tiempo por defecto
+    if fecha_inicio is None:
+        fecha_inicio = datetime(2024, 12, 1)
+    if fecha_fin is None:
+        fecha_fin = datetime(2025, 10, 19)
     
-    print("Obteniendo datos meteorológicos de Bucaramanga...")
+    print(f"Obteniendo datos meteorológicos de {ciudad}...")
     print(f"Período: {fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}")
     print("Intervalo: Cada hora")
     print("-" * 60)
     
     # Obtener datos horarios
-    data = Hourly(bucaramanga, fecha_inicio, fecha_fin)
-    data = data.fetch()
+    with etapa('red'):
+        data = Hourly(punto, fecha_inicio, fecha_fin)
+        data = data.fetch()
     
     if data.empty:
         print("No se encontraron datos para el período especificado.")
         return None
     
+    with etapa('dataframe'):
+        df_final = normalizar_datos(data, ciudad)
+    if derivadas:
+        with etapa('derivadas'):
+            df_final = calcular_derivadas(df_final, None if derivadas is True else derivadas)
+    
+    print(f"\nTotal de registros obtenidos: {len(df_final)}")
+    print(f"Columnas disponibles: {', '.join(df_final.columns)}")
+    
+    return df_final
+
+def normalizar_datos(data, ciudad='Bucaramanga'):
+    """
+    Convierte el DataFrame devuelto por Hourly.fetch() (índice 'time')
+    al formato de columnas unificado
+    """
     # Resetear el índice para tener la columna 'time' disponible
     data = data.reset_index()
     
     # Crear DataFrame con las columnas en el orden especificado
     df_final = pd.DataFrame()
-    df_final['Ciudad'] = ['Bucaramanga'] * len(data)
+    df_final['Ciudad'] = [ciudad] * len(data)
     df_final['Fecha'] = data['time'].dt.strftime('%d/%m/%Y')
     df_final['Hora'] = data['time'].dt.strftime('%H:%M')
     
@@ -81,11 +112,9 @@ def obtener_datos_meteorologicos():
     if 'coco' in data.columns:
         df_final['Condición'] = data['coco']
     
-    print(f"\nTotal de registros obtenidos: {len(df_final)}")
-    print(f"Columnas disponibles: {', '.join(df_final.columns)}")
-    
     return df_final
 
+@perfilar()
 def guardar_excel(df, nombre_archivo='Bucaramanga.xlsx'):
     """
     Guarda el DataFrame en formato Excel
@@ -95,20 +124,22 @@ def guardar_excel(df, nombre_archivo='Bucaramanga.xlsx'):
         return
     
     try:
-        # Guardar en Excel con formato
-        with pd.ExcelWriter(nombre_archivo, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Datos Meteorológicos')
+        # Guardar en Excel con formato (el tiempo propio de 'openpyxl' es el guardado del archivo)
+        with etapa('openpyxl'), pd.ExcelWriter(nombre_archivo, engine='openpyxl') as writer:
+            with etapa('to_excel'):
+                df.to_excel(writer, index=False, sheet_name='Datos Meteorológicos')
             
             # Obtener el worksheet para aplicar formato
             worksheet = writer.sheets['Datos Meteorológicos']
             
             # Ajustar ancho de columnas
-            for idx, col in enumerate(df.columns, 1):
-                max_length = max(
-                    df[col].astype(str).apply(len).max(),
-                    len(col)
-                ) + 2
-                worksheet.column_dimensions[chr(64 + idx)].width = min(max_length, 20)
+            with etapa('anchos_columna'):
+                for idx, col in enumerate(df.columns, 1):
+                    max_length = max(
+                        df[col].astype(str).apply(len).max(),
+                        len(col)
+                    ) + 2
+                    worksheet.column_dimensions[chr(64 + idx)].width = min(max_length, 20)
         
         print(f"\n✓ Datos guardados exitosamente en: {nombre_archivo}")
         
@@ -144,7 +175,12 @@ def main():
     
     # Obtener datos
     df = obtener_datos_meteorologicos()
-    
+    mostrar_resultados(df)
+
+def mostrar_resultados(df):
+    """
+    Guarda el Excel y muestra un resumen de los datos obtenidos
+    """
     if df is not None:
         # Guardar en Excel
         # Guardar archivo con formato ciudad_fechainicio_fechafin.xlsx
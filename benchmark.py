@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark reproducible de extracción, normalización y escritura de datos
+meteorológicos usando el servidor stub local (servidor_stub.py)
+Fecha: 2025-10-20
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+def medir(funcion, repeticiones):
+    """
+    Ejecuta la función varias veces silenciando su salida y devuelve los tiempos en segundos
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+def resumir(tiempos):
+    return {
+        'min': min(tiempos),
+        'mediana': statistics.median(tiempos),
+        'max': max(tiempos),
+        'repeticiones': len(tiempos),
+    }
+
+def version_git():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRECTORIO,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ejecutar_benchmark(tamanos, repeticiones=3, latencia=0.0, tasa_errores=0.0, tasa_429=0.0):
+    """
+    Ejecuta todas las etapas para cada tamaño (en días de datos horarios)
+
+    Returns:
+        dict: Resultados por etapa y tamaño, con metadatos del entorno
+    """
+    import pandas as pd
+    import servidor_stub
+    import API_WeatherAPI
+    from cache_columnar import leer_cacheado
+    from utilidades import cargar_script, leer_tabla
+
+    recortar = cargar_script('recortar-columnas.py')
+    validacion = cargar_script('validacion-empty-data.py')
+    try:
+        import API_meteostat
+    except ImportError as e:
+        print(f"⚠️  Se omite la normalización de Meteostat: {e}")
+        API_meteostat = None
+
+    servidor, url = servidor_stub.iniciar_servidor(latencia=latencia, tasa_errores=tasa_errores,
+                                                   tasa_429=tasa_429)
+    resultados = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': version_git(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'parametros': {'latencia': latencia, 'tasa_errores': tasa_errores, 'tasa_429': tasa_429},
+        'etapas': {},
+    }
+
+    def registrar(etapa, dias, tiempos):
+        resultados['etapas'].setdefault(etapa, {})[str(dias)] = resumir(tiempos)
+        print(f"  {etapa:<28} {dias:>5} días  mediana {statistics.median(tiempos):8.3f} s")
+
+    directorio_original = os.getcwd()
+    cache_original = os.environ.get('BUCARAPI_CACHE')
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            os.environ['BUCARAPI_CACHE'] = os.path.join(tmp, 'cache')
+            inicio = datetime(2024, 12, 1)
+            for dias in tamanos:
+                print(f"\nTamaño: {dias} días ({dias * 24:,} registros)")
+                fin = inicio + timedelta(days=dias - 1)
+
+                # Extracción completa contra el servidor stub
+                tiempos = medir(lambda: API_WeatherAPI.obtener_datos_meteorologicos(
+                    'stub', fecha_inicio=inicio, fecha_fin=fin, base_url=url,
+                    pausa=0, espera_rate_limit=0), repeticiones)
+                registrar('extraccion_weatherapi', dias, tiempos)
+
+                # Normalización sin red
+                horas = [h for d in range(dias)
+                         for h in servidor_stub.generar_dia_weatherapi(
+                             (inicio + timedelta(days=d)).strftime('%Y-%m-%d'))['forecast']['forecastday'][0]['hour']]
+                registros = [API_WeatherAPI.extraer_registro(h) for h in horas]
+                registrar('parseo_weatherapi', dias,
+                          medir(lambda: [API_WeatherAPI.extraer_registro(h) for h in horas], repeticiones))
+                registrar('normalizacion_weatherapi', dias,
+                          medir(lambda: API_WeatherAPI.construir_dataframe(registros), repeticiones))
+
+                if API_meteostat is not None:
+                    frame = servidor_stub.generar_frame_meteostat(dias * 24, inicio)
+                    registrar('normalizacion_meteostat', dias,
+                              medir(lambda: API_meteostat.normalizar_datos(frame), repeticiones))
+
+                # Escrituras
+                df = API_WeatherAPI.construir_dataframe(registros)
+                archivo_excel = f'bench_{dias}.xlsx'
+                registrar('escritura_excel', dias,
+                          medir(lambda: API_WeatherAPI.guardar_excel(df, archivo_excel), repeticiones))
+                try:
+                    registrar('escritura_parquet', dias,
+                              medir(lambda: df.to_parquet(f'bench_{dias}.parquet', index=False), repeticiones))
+                except ImportError as e:
+                    print(f"  ⚠️  Se omite Parquet: {str(e).splitlines()[0]}")
+
+                # Lectura del Excel sin caché (línea base) y luego desde la caché columnar,
+                # que la primera llamada a leer_cacheado crea fuera de la medición
+                registrar('lectura_excel', dias, medir(lambda: leer_tabla(archivo_excel), repeticiones))
+                leer_cacheado(archivo_excel)
+                registrar('lectura_cache', dias, medir(lambda: leer_cacheado(archivo_excel), repeticiones))
+
+                # Herramientas de análisis sobre el Excel generado
+                registrar('exportar_columnas', dias, medir(lambda: recortar.exportar_columnas(
+                    archivo_excel, ['Ciudad', 'Fecha', 'Hora', 'Temperatura'], f'bench_{dias}_cols.xlsx'),
+                    repeticiones))
+                registrar('analizar_fechas_completo', dias,
+                          medir(lambda: validacion.analizar_fechas_completo(archivo_excel), repeticiones))
+    finally:
+        os.chdir(directorio_original)
+        if cache_original is None:
+            os.environ.pop('BUCARAPI_CACHE', None)
+        else:
+            os.environ['BUCARAPI_CACHE'] = cache_original
+        resultados['solicitudes_stub'] = servidor.solicitudes
+        servidor.shutdown()
+
+    return resultados
+
+def comparar(anterior, actual, tolerancia):
+    """
+    Compara dos resultados por mediana y devuelve la lista de regresiones
+    (etapa, tamaño, mediana anterior, mediana actual, razón)
+    """
+    regresiones = []
+    print(f"\n{'='*80}")
+    print(f"COMPARACIÓN (tolerancia {tolerancia:.0%})")
+    print(f"{'='*80}")
+    print(f"{'Etapa':<28} {'Días':>6} {'Anterior':>10} {'Actual':>10} {'Razón':>8}")
+    print(f"{'-'*80}")
+    for etapa, por_tamano in actual['etapas'].items():
+        for dias, medida in por_tamano.items():
+            previa = anterior.get('etapas', {}).get(etapa, {}).get(dias)
+            if previa is None:
+                continue
+            razon = medida['mediana'] / previa['mediana'] if previa['mediana'] else float('inf')
+            marca = '⚠️' if razon > 1 + tolerancia else ''
+            print(f"{etapa:<28} {dias:>6} {previa['mediana']:>10.3f} {medida['mediana']:>10.3f} {razon:>7.2f}x {marca}")
+            if razon > 1 + tolerancia:
+                regresiones.append((etapa, dias, previa['mediana'], medida['mediana'], razon))
+    return regresiones
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Benchmark de BucarAPI con servidor stub local')
+    parser.add_argument('--tamanos', default='7,30,180',
+                        help='Tamaños en días separados por comas (por defecto: 7,30,180)')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--latencia', type=float, default=0.0, help='Latencia del stub en segundos')
+    parser.add_argument('--tasa-errores', type=float, default=0.0, help='Probabilidad de respuestas 500')
+    parser.add_argument('--tasa-429', type=float, default=0.0, help='Probabilidad de respuestas 429')
+    parser.add_argument('--salida', default='bench_resultados.json', help='Archivo JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior para detectar regresiones')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='Aumento relativo permitido antes de marcar regresión (por defecto: 0.2)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, DIRECTORIO)
+    tamanos = [int(t) for t in args.tamanos.split(',') if t.strip()]
+
+    print("=" * 80)
+    print("BENCHMARK BUCARAPI")
+    print("=" * 80)
+
+    resultados = ejecutar_benchmark(tamanos, args.repeticiones, args.latencia,
+                                    args.tasa_errores, args.tasa_429)
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"\n✓ Resultados guardados en: {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        regresiones = comparar(anterior, resultados, args.tolerancia)
+        if regresiones:
+            print(f"\n❌ {len(regresiones)} regresiones detectadas.")
+            sys.exit(1)
+        print("\n✅ Sin regresiones.")
+
+if __name__ == "__main__":
+    main()
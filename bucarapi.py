@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Punto de entrada único de BucarAPI con subcomandos (fetch, fetch-all, fetch-grid, trim,
+validate, export).
+Las dependencias pesadas (pandas, requests, meteostat, openpyxl) se importan sólo
+dentro del subcomando que las necesita, de modo que --help y los errores de
+argumentos o de rutas responden sin cargarlas.
+Fecha: 2025-10-20
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+def _fecha(texto):
+    try:
+        return datetime.strptime(texto, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{texto}' (formato YYYY-MM-DD)")
+
+def _archivo_existente(ruta):
+    if not os.path.exists(ruta):
+        raise argparse.ArgumentTypeError(f"el archivo '{ruta}' no existe")
+    return ruta
+
+def _obtener_api_key(args):
+    """
+    API key de WeatherAPI desde --api-key, la variable WEATHERAPI_KEY o la consola
+    (cadena vacía, ya informada, si no se proporcionó)
+    """
+    api_key = args.api_key or os.environ.get('WEATHERAPI_KEY') or \
+        input("Ingresa tu API key de WeatherAPI: ").strip()
+    if not api_key:
+        print("❌ API key no proporcionada. Saliendo...")
+    return api_key
+
+def comando_fetch(args):
+    if args.proveedor == 'weatherapi':
+        import API_WeatherAPI as proveedor
+
+        api_key = None
+        if not args.reproducir:
+            api_key = _obtener_api_key(args)
+            if not api_key:
+                return 1
+        df = proveedor.obtener_datos_meteorologicos(
+            api_key, args.ciudad, args.lat, args.lon, args.desde, args.hasta,
+            grabar=args.grabar, reproducir=args.reproducir, derivadas=args.derivadas)
+    else:
+        import API_meteostat as proveedor
+
+        df = proveedor.obtener_datos_meteorologicos(
+            args.ciudad, args.lat, args.lon, args.alt, args.desde, args.hasta, derivadas=args.derivadas)
+
+    if df is None:
+        print("No se pudieron obtener los datos.")
+        return 1
+    if args.almacen:
+        import fusion
+
+        e = fusion.guardar_lote(df, args.almacen, args.proveedor, args.politica)
+        print(f"✓ Almacén {args.almacen}: {e['insertados']:,} insertados, {e['reemplazados']:,} reemplazados, "
+              f"{e['conservados']:,} conservados ({e['particiones']:,} días escritos)")
+    if args.salida:
+        proveedor.guardar_excel(df, nombre_archivo=args.salida)
+    elif args.almacen:
+        return 0
+    elif args.proveedor == 'weatherapi':
+        proveedor.mostrar_resultados(df, args.ciudad)
+    else:
+        proveedor.mostrar_resultados(df)
+    return 0
+
+def comando_fetch_all(args):
+    import orquestador
+
+    api_key = None
+    if 'weatherapi' in args.proveedores:
+        api_key = _obtener_api_key(args)
+        if not api_key:
+            return 1
+    _, resumen = orquestador.orquestar(
+        args.ubicaciones, args.desde, args.hasta, args.proveedores, api_key, args.base_url, args.almacen,
+        args.politica, dict(args.concurrencia), args.umbral_fallos, args.pausa_circuito, args.timeout,
+        derivadas=args.derivadas)
+    orquestador.imprimir_resumen(resumen)
+    return 0 if any(r['completadas'] for r in resumen.values()) else 1
+
+def comando_fetch_grid(args):
+    import malla
+    import orquestador
+
+    if not args.solo_fuentes and not args.almacen and not args.salida:
+        print("❌ Error: indique --almacen o --salida")
+        return 1
+    api_key = None
+    if 'weatherapi' in args.proveedores:
+        api_key = _obtener_api_key(args)
+        if not api_key:
+            return 1
+    celdas = malla.generar_malla(args.bbox, args.resolucion_km, args.prefijo)
+    print(f"✓ Malla de {len(celdas):,} celdas de {args.resolucion_km} km")
+    concurrencia = dict(args.concurrencia)
+
+    if args.solo_fuentes:
+        for p in args.proveedores:
+            try:
+                mapa = malla.asignar_fuentes(celdas, p, api_key, args.url_busqueda,
+                                             hilos=concurrencia.get(p, orquestador.CONCURRENCIA[p]))
+            except orquestador.ErrorDefinitivo as e:
+                print(f"❌ {p}: no se pueden buscar fuentes ({e})")
+                continue
+            salida = f"Fuentes_{args.prefijo}_{p}.csv"
+            mapa.to_csv(salida, index=False, encoding='utf-8')
+            print(f"✓ {p}: {mapa['Fuente'].nunique():,} fuentes únicas para {len(mapa):,} celdas → {salida}")
+        return 0
+
+    datos, resumen = malla.extraer_malla(
+        celdas, args.desde, args.hasta, args.proveedores, api_key, args.base_url, args.url_busqueda,
+        args.almacen, args.politica, concurrencia, args.derivadas, umbral_fallos=args.umbral_fallos,
+        pausa_circuito=args.pausa_circuito, timeout=args.timeout)
+    orquestador.imprimir_resumen(resumen)
+
+    if args.salida:
+        base, extension = os.path.splitext(args.salida)
+        for p, df in datos.items():
+            if df is not None:
+                ruta = f"{base}_{p}{extension or '.csv'}"
+                df.to_csv(ruta, index=False, encoding='utf-8')
+                print(f"✓ {p}: {len(df):,} registros guardados en: {ruta}")
+    return 0 if any(r['completadas'] for r in resumen.values()) else 1
+
+def comando_trim(args):
+    from utilidades import cargar_script
+
+    recortar = cargar_script('recortar-columnas.py')
+    recortar.exportar_columnas(args.archivo, args.columnas, args.salida)
+    return 0
+
+def comando_validate(args):
+    from utilidades import cargar_script
+
+    validacion = cargar_script('validacion-empty-data.py')
+    resultado = validacion.analizar_fechas_completo(args.archivo)
+    if args.qc:
+        import control_calidad
+
+        if args.bloques:
+            # Sólo se acumula el resumen: los bloques no se retienen en memoria
+            resumen, total = control_calidad.resumen_por_bloques(control_calidad.controlar_por_bloques(
+                control_calidad.leer_por_bloques(args.archivo, args.bloques)))
+        else:
+            from cache_columnar import leer_cacheado
+            df = control_calidad.controlar_calidad(leer_cacheado(args.archivo))
+            resumen, total = control_calidad.resumen_calidad(df), len(df)
+        if resumen is not None:
+            control_calidad.imprimir_resumen(resumen, total)
+    return 0 if resultado is not None else 1
+
+def comando_export(args):
+    from cache_columnar import leer_cacheado
+
+    df = leer_cacheado(args.archivo)
+    salida = args.salida or f"{os.path.splitext(os.path.basename(args.archivo))[0]}.{args.formato}"
+    if args.formato == 'csv':
+        df.to_csv(salida, index=False, encoding='utf-8')
+    elif args.formato == 'parquet':
+        try:
+            df.to_parquet(salida, index=False)
+        except ImportError:
+            # Dependencia opcional, como zstandard para los logs .zst
+            print("❌ Error: para exportar a parquet instale el paquete 'pyarrow' (pip install pyarrow)")
+            return 1
+    else:
+        import API_WeatherAPI
+        API_WeatherAPI.guardar_excel(df, nombre_archivo=salida)
+        return 0
+    print(f"✓ {len(df):,} registros exportados a: {salida}")
+    return 0
+
+def _ubicacion(texto):
+    from orquestador import interpretar_ubicacion
+    return interpretar_ubicacion(texto)
+
+def _bbox(texto):
+    from orquestador import interpretar_bbox
+    return interpretar_bbox(texto)
+
+def _proveedores(texto):
+    proveedores = [p.strip() for p in texto.split(',') if p.strip()]
+    for p in proveedores:
+        if p not in ('weatherapi', 'meteostat'):
+            raise argparse.ArgumentTypeError(f"proveedor desconocido '{p}'")
+    return proveedores
+
+def _concurrencia(texto):
+    proveedor, _, n = texto.partition('=')
+    if proveedor not in ('weatherapi', 'meteostat') or not n.isdigit() or int(n) < 1:
+        raise argparse.ArgumentTypeError(f"concurrencia inválida '{texto}' (formato PROVEEDOR=N, p. ej. weatherapi=4)")
+    return proveedor, int(n)
+
+def _agregar_opciones_extraccion(parser):
+    """
+    Opciones comunes de fetch-all y fetch-grid: proveedores, período, API,
+    fusión en el almacén, concurrencia y circuit breaker
+    """
+    parser.add_argument('--proveedores', type=_proveedores, default=['weatherapi', 'meteostat'],
+                        help='Lista separada por comas (por defecto: weatherapi,meteostat)')
+    parser.add_argument('--desde', type=_fecha, default=datetime(2024, 12, 1), help='YYYY-MM-DD')
+    parser.add_argument('--hasta', type=_fecha, default=datetime(2025, 10, 19), help='YYYY-MM-DD')
+    parser.add_argument('--api-key', help='API key de WeatherAPI (o variable WEATHERAPI_KEY)')
+    parser.add_argument('--base-url', help='URL de history.json (por ejemplo la de servidor_stub.py)')
+    parser.add_argument('--politica', choices=['ultimo', 'calidad'], default='ultimo')
+    parser.add_argument('--concurrencia', type=_concurrencia, action='append', default=[], metavar='PROVEEDOR=N',
+                        help='Solicitudes simultáneas de un proveedor (se puede repetir; '
+                             'por defecto weatherapi=4, meteostat=2)')
+    parser.add_argument('--umbral-fallos', type=int, default=5,
+                        help='Fallos seguidos (5xx o timeout) que pausan un proveedor')
+    parser.add_argument('--pausa-circuito', type=float, default=60, help='Segundos de pausa del proveedor')
+    parser.add_argument('--timeout', type=float, default=30, help='Segundos máximos por solicitud')
+    parser.add_argument('--derivadas', action='store_true', help='Agregar variables derivadas')
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog='bucarapi', description='Herramientas de datos meteorológicos de BucarAPI')
+    parser.add_argument('--perfil', metavar='MODOS',
+                        help='Perfilar la ejecución: tiempos, cprofile, memoria, flamegraph o todo '
+                             '(separados por comas; también con la variable BUCARAPI_PERFIL)')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    fetch = sub.add_parser('fetch', help='Extraer datos de un proveedor')
+    fetch.add_argument('proveedor', choices=['weatherapi', 'meteostat'])
+    fetch.add_argument('--ciudad', default='Bucaramanga')
+    fetch.add_argument('--lat', type=float, default=7.1193)
+    fetch.add_argument('--lon', type=float, default=-73.1227)
+    fetch.add_argument('--alt', type=float, default=959, help='Altitud en metros (sólo meteostat)')
+    fetch.add_argument('--desde', type=_fecha, default=datetime(2024, 12, 1), help='YYYY-MM-DD')
+    fetch.add_argument('--hasta', type=_fecha, default=datetime(2025, 10, 19), help='YYYY-MM-DD')
+    fetch.add_argument('--api-key', help='API key de WeatherAPI (o variable WEATHERAPI_KEY)')
+    grupo = fetch.add_mutually_exclusive_group()
+    grupo.add_argument('--grabar', metavar='LOG', help='Grabar el tráfico de WeatherAPI en un log JSONL')
+    grupo.add_argument('--reproducir', metavar='LOG', type=_archivo_existente, help='Reproducir el tráfico de WeatherAPI desde un log')
+    fetch.add_argument('--derivadas', action='store_true', help='Agregar variables derivadas')
+    fetch.add_argument('--salida', help='Archivo .xlsx de salida')
+    fetch.add_argument('--almacen', metavar='DIR', help='Fusionar en un almacén deduplicado en lugar de generar un Excel')
+    fetch.add_argument('--politica', choices=['ultimo', 'calidad'], default='ultimo',
+                       help='Regla de fusión en el almacén (por defecto: ultimo)')
+    fetch.set_defaults(funcion=comando_fetch)
+
+    fetch_all = sub.add_parser('fetch-all', help='Extraer varios proveedores y ubicaciones a la vez hacia el almacén')
+    fetch_all.add_argument('--ubicacion', action='append', type=_ubicacion, dest='ubicaciones', metavar='CIUDAD:LAT:LON[:ALT]',
+                           help='Ciudad:lat:lon[:alt] (se puede repetir; por defecto Bucaramanga)')
+    fetch_all.add_argument('--almacen', metavar='DIR', required=True, help='Directorio del almacén deduplicado')
+    _agregar_opciones_extraccion(fetch_all)
+    fetch_all.set_defaults(funcion=comando_fetch_all)
+
+    fetch_grid = sub.add_parser('fetch-grid', help='Extraer una malla de puntos consultando cada fuente única una vez')
+    fetch_grid.add_argument('--bbox', type=_bbox, default=(6.95, -73.20, 7.20, -73.00),
+                            metavar='LAT_MIN,LON_MIN,LAT_MAX,LON_MAX',
+                            help='Área a cubrir (por defecto: área metropolitana de Bucaramanga)')
+    fetch_grid.add_argument('--resolucion-km', type=float, default=2.0, help='Lado de cada celda en km')
+    fetch_grid.add_argument('--prefijo', default='Malla', help='Prefijo del nombre de las celdas')
+    fetch_grid.add_argument('--url-busqueda', default='http://api.weatherapi.com/v1/search.json',
+                            help='URL de search.json')
+    destino = fetch_grid.add_mutually_exclusive_group()
+    destino.add_argument('--almacen', metavar='DIR', help='Directorio del almacén deduplicado')
+    destino.add_argument('--salida', help='Archivo .csv con los datos por celda (uno por proveedor)')
+    fetch_grid.add_argument('--solo-fuentes', action='store_true',
+                            help='Sólo mostrar y guardar la asignación celda → fuente, sin descargar datos')
+    _agregar_opciones_extraccion(fetch_grid)
+    fetch_grid.set_defaults(funcion=comando_fetch_grid)
+
+    trim = sub.add_parser('trim', help='Exportar sólo algunas columnas de un Excel')
+    trim.add_argument('archivo', type=_archivo_existente)
+    trim.add_argument('columnas', nargs='*', default=['Ciudad', 'Fecha', 'Hora', 'Temperatura', 'Presión', 'Humedad'])
+    trim.add_argument('--salida')
+    trim.set_defaults(funcion=comando_trim)
+
+    validate = sub.add_parser('validate', help='Analizar registros por fecha (y control de calidad)')
+    validate.add_argument('archivo', type=_archivo_existente)
+    validate.add_argument('--qc', action='store_true', help='Ejecutar también el control de calidad')
+    validate.add_argument('--bloques', type=int, metavar='FILAS', help='Control de calidad por bloques')
+    validate.set_defaults(funcion=comando_validate)
+
+    export = sub.add_parser('export', help='Convertir un archivo a csv, parquet o xlsx')
+    export.add_argument('archivo', type=_archivo_existente)
+    export.add_argument('--formato', choices=['csv', 'parquet', 'xlsx'], default='csv')
+    export.add_argument('--salida')
+    export.set_defaults(funcion=comando_export)
+
+    return parser
+
+def main(argv=None):
+    """
+    Función principal
+    """
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    sys.path.insert(0, DIRECTORIO)
+    if args.perfil:
+        import perfilado
+        try:
+            perfilado.activar(args.perfil)
+        except ValueError as e:
+            parser.error(str(e))
+    return args.funcion(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché columnar en disco para lecturas repetidas de archivos Excel/CSV.
+La primera lectura guarda cada columna como un .npy; las siguientes las
+abren con memory-map (sin copiar ni volver a interpretar el xlsx)
+Fecha: 2025-10-20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utilidades import leer_tabla
+
+VERSION = 1
+
+def directorio_cache():
+    """
+    Directorio de la caché: variable BUCARAPI_CACHE o ~/.cache/bucarapi
+    """
+    return os.environ.get('BUCARAPI_CACHE') or os.path.join(os.path.expanduser('~'), '.cache', 'bucarapi')
+
+def _hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _escribir_json(ruta, datos):
+    # Temporal único por escritura: dos ejecuciones simultáneas (p. ej. de cron) no
+    # comparten el archivo temporal, y cada os.replace deja un JSON completo
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+def _clave(ruta, cache):
+    """
+    Hash del contenido del archivo. El índice (ruta -> mtime, tamaño, hash)
+    evita recalcularlo mientras el archivo no cambie.
+    """
+    ruta_abs = os.path.abspath(ruta)
+    info = os.stat(ruta_abs)
+    ruta_indice = os.path.join(cache, 'indice.json')
+    try:
+        with open(ruta_indice, encoding='utf-8') as f:
+            indice = json.load(f)
+    except (OSError, ValueError):
+        indice = {}
+
+    entrada = indice.get(ruta_abs)
+    if entrada and entrada['mtime_ns'] == info.st_mtime_ns and entrada['tamano'] == info.st_size:
+        return entrada['hash']
+
+    clave = _hash_archivo(ruta_abs)
+    indice[ruta_abs] = {'mtime_ns': info.st_mtime_ns, 'tamano': info.st_size, 'hash': clave}
+    _escribir_json(ruta_indice, indice)
+
+    # El contenido anterior ya no sirve si ningún otro archivo lo comparte
+    if entrada and entrada['hash'] != clave and all(e['hash'] != entrada['hash'] for e in indice.values()):
+        shutil.rmtree(os.path.join(cache, entrada['hash']), ignore_errors=True)
+    return clave
+
+def _es_texto(serie):
+    valores = serie.dropna()
+    return valores.map(type).eq(str).all() if len(valores) else True
+
+def _guardar_columnas(df, destino):
+    """
+    Guarda cada columna como .npy: las numéricas y de fecha tal cual, el texto
+    como códigos enteros + categorías en el manifiesto y cualquier otra columna
+    (tipos mezclados) serializada con pickle
+    """
+    columnas = []
+    for i, nombre in enumerate(df.columns):
+        serie = df[nombre]
+        archivo = f'{i}.npy'
+        entrada = {'nombre': str(nombre), 'archivo': archivo}
+        if serie.dtype.kind in 'biufcmM':
+            np.save(os.path.join(destino, archivo), serie.to_numpy())
+            entrada['tipo'] = 'arreglo'
+        elif _es_texto(serie):
+            codigos, categorias = pd.factorize(serie.astype(object))
+            np.save(os.path.join(destino, archivo), codigos.astype(np.int32))
+            entrada['tipo'] = 'texto'
+            entrada['categorias'] = [str(c) for c in categorias]
+        else:
+            np.save(os.path.join(destino, archivo), serie.to_numpy(dtype=object), allow_pickle=True)
+            entrada['tipo'] = 'objeto'
+        columnas.append(entrada)
+
+    _escribir_json(os.path.join(destino, 'manifiesto.json'),
+                   {'version': VERSION, 'filas': len(df), 'columnas': columnas})
+
+def _abrir_columnas(origen, usecols=None, categoricas=False):
+    """
+    Abre las columnas guardadas con memory-map (modo copy-on-write: se pueden
+    modificar en memoria sin tocar la caché). Las columnas de texto se
+    reconstruyen desde sus códigos, como categóricas si categoricas=True.
+    """
+    with open(os.path.join(origen, 'manifiesto.json'), encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    if manifiesto.get('version') != VERSION:
+        return None
+
+    datos = {}
+    for columna in manifiesto['columnas']:
+        if usecols is not None and columna['nombre'] not in usecols:
+            continue
+        ruta = os.path.join(origen, columna['archivo'])
+        if columna['tipo'] == 'arreglo':
+            datos[columna['nombre']] = np.load(ruta, mmap_mode='c').view(np.ndarray)
+        elif columna['tipo'] == 'texto':
+            codigos = np.load(ruta, mmap_mode='c').view(np.ndarray)
+            if categoricas:
+                datos[columna['nombre']] = pd.Categorical.from_codes(codigos, categories=columna['categorias'])
+            else:
+                # Código -1 = valor faltante
+                datos[columna['nombre']] = np.array(columna['categorias'] + [np.nan], dtype=object)[codigos]
+        else:
+            datos[columna['nombre']] = np.load(ruta, allow_pickle=True)
+    return pd.DataFrame(datos, copy=False)
+
+def leer_cacheado(ruta, usecols=None, categoricas=False):
+    """
+    Lee un .xlsx o .csv pasando por la caché columnar. Si la caché no existe
+    o el archivo cambió (mtime/tamaño y hash del contenido), se interpreta el
+    archivo y se guarda la copia columnar; si no, se abre con memory-map.
+    Las columnas numéricas y de fecha quedan respaldadas por el memory-map.
+
+    Con la variable BUCARAPI_SIN_CACHE=1 se lee el archivo directamente.
+
+    Args:
+        ruta (str): Archivo de entrada
+        usecols (list): Columnas a cargar (None = todas)
+        categoricas (bool): Devolver las columnas de texto como categóricas
+
+    Returns:
+        DataFrame: Contenido del archivo
+    """
+    if os.environ.get('BUCARAPI_SIN_CACHE'):
+        return leer_tabla(ruta, usecols=usecols)
+
+    cache = directorio_cache()
+    os.makedirs(cache, exist_ok=True)
+    destino = os.path.join(cache, _clave(ruta, cache))
+
+    if os.path.exists(os.path.join(destino, 'manifiesto.json')):
+        df = _abrir_columnas(destino, usecols, categoricas)
+        if df is not None:
+            return df
+        shutil.rmtree(destino, ignore_errors=True)
+
+    df = leer_tabla(ruta)
+
+    # Escribir en un directorio temporal y renombrar: otra herramienta nunca ve una caché a medias
+    temporal = tempfile.mkdtemp(dir=cache)
+    try:
+        _guardar_columnas(df, temporal)
+        os.replace(temporal, destino)
+    except OSError:
+        shutil.rmtree(temporal, ignore_errors=True)
+        if not os.path.exists(os.path.join(destino, 'manifiesto.json')):
+            raise
+
+    return _abrir_columnas(destino, usecols, categoricas)
+
+def limpiar_cache():
+    """
+    Elimina toda la caché columnar
+    """
+    shutil.rmtree(directorio_cache(), ignore_errors=True)
+
+def main():
+    """
+    Función principal: precarga archivos en la caché o la limpia
+    """
+    parser = argparse.ArgumentParser(description='Caché columnar (memory-mapped) de archivos Excel/CSV')
+    parser.add_argument('archivos', nargs='*', help='Archivos a precargar en la caché')
+    parser.add_argument('--limpiar', action='store_true', help='Eliminar la caché')
+    args = parser.parse_args()
+
+    if args.limpiar:
+        limpiar_cache()
+        print(f"✓ Caché eliminada: {directorio_cache()}")
+
+    for archivo in args.archivos:
+        if not os.path.exists(archivo):
+            print(f"❌ Error: El archivo '{archivo}' no existe.")
+            sys.exit(1)
+        df = leer_cacheado(archivo)
+        print(f"✓ {archivo}: {len(df):,} registros, {len(df.columns)} columnas en caché")
+
+    if not args.archivos and not args.limpiar:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de control de calidad vectorizado: rango físico, picos, saltos y
+valores planos por variable, con banderas en una columna de bits ('QC')
+Fecha: 2025-10-20
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cache_columnar import leer_cacheado
+from utilidades import construir_marca_tiempo
+
+# Chequeos (un bit por chequeo dentro del bloque de 4 bits de cada variable)
+RANGO = 1
+PICO = 2
+SALTO = 4
+PLANO = 8
+CHEQUEOS = {'Rango': RANGO, 'Pico': PICO, 'Salto': SALTO, 'Plano': PLANO}
+BITS_POR_VARIABLE = 4
+
+# Límites por variable (mismas columnas que imprimir_unidades):
+#   rango: (mínimo, máximo) físicamente posible
+#   pico: desviación máxima respecto a la mediana móvil centrada
+#   salto: diferencia máxima entre horas consecutivas
+#   plano: número de horas consecutivas con el mismo valor que se considera sospechoso
+# None desactiva el chequeo (p. ej. la precipitación es intermitente por naturaleza)
+LIMITES = {
+    'Temperatura':       {'rango': (-40, 55),   'pico': 8,   'salto': 10,   'plano': 6},
+    'Presión':           {'rango': (850, 1090), 'pico': 6,   'salto': 5,    'plano': 12},
+    'Humedad':           {'rango': (0, 100),    'pico': 35,  'salto': 45,   'plano': 24},
+    'Punto de Rocío':    {'rango': (-50, 35),   'pico': 8,   'salto': 10,   'plano': 6},
+    'Precipitación':     {'rango': (0, 200),    'pico': None, 'salto': None, 'plano': None},
+    'Dirección Viento':  {'rango': (0, 360),    'pico': None, 'salto': None, 'plano': 24},
+    'Velocidad Viento':  {'rango': (0, 250),    'pico': 40,  'salto': None, 'plano': None},
+    'Ráfaga Viento':     {'rango': (0, 400),    'pico': None, 'salto': None, 'plano': None},
+    'Nubosidad':         {'rango': (0, 100),    'pico': None, 'salto': None, 'plano': None},
+    'Sensación Térmica': {'rango': (-60, 70),   'pico': 10,  'salto': 12,   'plano': 6},
+    'Visibilidad':       {'rango': (0, 100),    'pico': None, 'salto': None, 'plano': None},
+    'Índice UV':         {'rango': (0, 20),     'pico': None, 'salto': 8,    'plano': None},
+}
+
+# Ventana (en registros) de la mediana móvil usada para detectar picos
+VENTANA_PICO = 5
+
+def desplazamiento(variable, limites=None):
+    """
+    Posición del primer bit de la variable dentro de la columna QC
+    """
+    return list(limites or LIMITES).index(variable) * BITS_POR_VARIABLE
+
+def _ordenar(df):
+    """
+    Devuelve (orden, grupos): permutación que ordena por ciudad y tiempo y el
+    código de ciudad de cada fila ya ordenada
+    """
+    marca = construir_marca_tiempo(df) if {'Fecha', 'Hora'}.issubset(df.columns) else pd.Series(
+        np.arange(len(df)), index=df.index)
+    ciudad = df['Ciudad'].astype(str) if 'Ciudad' in df.columns else pd.Series('', index=df.index)
+    codigos = pd.factorize(ciudad)[0]
+    orden = np.lexsort((marca.to_numpy(), codigos))
+    return orden, codigos[orden]
+
+def _banderas_variable(x, grupos, limites):
+    """
+    Calcula los bits de una variable sobre valores ya ordenados por ciudad y tiempo
+    """
+    n = len(x)
+    bits = np.zeros(n, dtype=np.uint8)
+    presente = ~np.isnan(x)
+    mismo_grupo = np.zeros(n, dtype=bool)
+    mismo_grupo[1:] = grupos[1:] == grupos[:-1]
+
+    with np.errstate(invalid='ignore'):
+        lo, hi = limites['rango']
+        fuera = presente & ((x < lo) | (x > hi))
+    bits[fuera] |= RANGO
+
+    # Los valores fuera de rango no participan en los chequeos temporales
+    limpio = np.where(fuera, np.nan, x)
+
+    if limites.get('salto') is not None:
+        diferencia = np.full(n, np.nan)
+        diferencia[1:] = np.abs(limpio[1:] - limpio[:-1])
+        with np.errstate(invalid='ignore'):
+            bits[mismo_grupo & (diferencia > limites['salto'])] |= SALTO
+
+    if limites.get('pico') is not None:
+        mediana = (pd.Series(limpio)
+                   .groupby(grupos)
+                   .rolling(VENTANA_PICO, center=True, min_periods=3)
+                   .median()
+                   .to_numpy())
+        with np.errstate(invalid='ignore'):
+            bits[np.abs(limpio - mediana) > limites['pico']] |= PICO
+
+    if limites.get('plano') is not None:
+        cambio = np.ones(n, dtype=bool)
+        cambio[1:] = ~mismo_grupo[1:] | (limpio[1:] != limpio[:-1])
+        racha = np.cumsum(cambio)
+        largo = np.bincount(racha)[racha]
+        bits[~np.isnan(limpio) & (largo >= limites['plano'])] |= PLANO
+
+    return bits
+
+def controlar_calidad(df, limites=None):
+    """
+    Aplica todos los chequeos a cada variable presente y agrega la columna 'QC'
+    (uint64, 4 bits por variable en el orden de LIMITES). Las series se evalúan
+    por ciudad y ordenadas por Fecha/Hora; el DataFrame conserva su orden original.
+
+    Args:
+        df (DataFrame): Datos en el formato unificado
+        limites (dict): Límites por variable (por defecto LIMITES)
+
+    Returns:
+        DataFrame: Copia del DataFrame con la columna 'QC'
+    """
+    limites = limites or LIMITES
+    if len(limites) * BITS_POR_VARIABLE > 64:
+        raise ValueError("Demasiadas variables para una columna QC de 64 bits.")
+
+    qc = np.zeros(len(df), dtype=np.uint64)
+    if len(df):
+        orden, grupos = _ordenar(df)
+        for i, (variable, lim) in enumerate(limites.items()):
+            if variable not in df.columns:
+                continue
+            x = pd.to_numeric(df[variable], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)[orden]
+            bits = _banderas_variable(x, grupos, lim).astype(np.uint64)
+            qc[orden] |= bits << np.uint64(i * BITS_POR_VARIABLE)
+
+    return df.assign(QC=qc)
+
+def bandera(df, variable, chequeo, limites=None):
+    """
+    Máscara booleana de las filas marcadas para una variable y un chequeo
+    (chequeo: RANGO, PICO, SALTO, PLANO o su nombre)
+    """
+    if isinstance(chequeo, str):
+        chequeo = CHEQUEOS[chequeo]
+    bit = np.uint64(chequeo) << np.uint64(desplazamiento(variable, limites))
+    return (df['QC'].to_numpy(dtype=np.uint64) & bit) != 0
+
+def resumen_calidad(df, limites=None):
+    """
+    Cuenta las filas marcadas por variable y chequeo
+
+    Returns:
+        DataFrame: Una fila por variable con conteos por chequeo, total y porcentaje
+    """
+    limites = limites or LIMITES
+    qc = df['QC'].to_numpy(dtype=np.uint64)
+    filas = []
+    for variable in limites:
+        if variable not in df.columns:
+            continue
+        bloque = (qc >> np.uint64(desplazamiento(variable, limites))) & np.uint64(0xF)
+        fila = {'Variable': variable}
+        for nombre, bit in CHEQUEOS.items():
+            fila[nombre] = int(np.count_nonzero(bloque & np.uint64(bit)))
+        fila['Total'] = int(np.count_nonzero(bloque))
+        fila['Porcentaje'] = round(fila['Total'] / len(df) * 100, 2) if len(df) else 0.0
+        filas.append(fila)
+    return pd.DataFrame(filas, columns=['Variable', *CHEQUEOS, 'Total', 'Porcentaje'])
+
+def resumen_por_bloques(partes, limites=None):
+    """
+    Combina resumen_calidad bloque a bloque sin retener los bloques en memoria
+
+    Args:
+        partes (iterable): DataFrames con la columna QC (p. ej. de controlar_por_bloques)
+
+    Returns:
+        tuple: (DataFrame como el de resumen_calidad o None si no hubo registros, total de filas)
+    """
+    resumen = None
+    total = 0
+    for parte in partes:
+        total += len(parte)
+        r = resumen_calidad(parte, limites).set_index('Variable')
+        resumen = r if resumen is None else resumen.add(r, fill_value=0)
+    if resumen is None:
+        return None, 0
+    resumen = resumen.drop(columns='Porcentaje').astype(int).reset_index()
+    resumen['Porcentaje'] = (resumen['Total'] / total * 100).round(2) if total else 0.0
+    return resumen, total
+
+def _contexto_necesario(limites):
+    planos = [lim['plano'] for lim in limites.values() if lim.get('plano')]
+    return max([VENTANA_PICO // 2 + 1, *planos])
+
+def controlar_por_bloques(bloques, limites=None):
+    """
+    Versión por bloques de controlar_calidad para entradas que no caben en memoria.
+    Cada bloque se evalúa junto con las últimas filas de cada ciudad del bloque
+    anterior, y las últimas filas de cada ciudad se retienen hasta conocer las
+    siguientes, de modo que las banderas coinciden con las de una sola pasada.
+    Los bloques deben llegar en orden cronológico dentro de cada ciudad.
+
+    Args:
+        bloques (iterable): DataFrames consecutivos en el formato unificado
+        limites (dict): Límites por variable (por defecto LIMITES)
+
+    Yields:
+        DataFrame: Filas con su columna 'QC' definitiva
+    """
+    limites = limites or LIMITES
+    w = _contexto_necesario(limites)
+    contexto = None
+
+    for bloque in bloques:
+        bloque = bloque.assign(_emitido=False)
+        datos = bloque if contexto is None else pd.concat([contexto, bloque], ignore_index=True)
+        resultado = controlar_calidad(datos, limites)
+
+        orden, grupos = _ordenar(resultado)
+        resultado = resultado.iloc[orden].reset_index(drop=True)
+        desde_fin = pd.Series(grupos).groupby(grupos).cumcount(ascending=False).to_numpy()
+
+        emitir = ~resultado['_emitido'].to_numpy() & (desde_fin >= w)
+        if emitir.any():
+            yield resultado.loc[emitir].drop(columns='_emitido')
+
+        resultado['_emitido'] = resultado['_emitido'] | emitir
+        contexto = resultado.loc[desde_fin < 2 * w].drop(columns='QC')
+
+    if contexto is not None:
+        resultado = controlar_calidad(contexto, limites)
+        pendientes = ~resultado['_emitido'].to_numpy()
+        if pendientes.any():
+            yield resultado.loc[pendientes].drop(columns='_emitido')
+
+def leer_por_bloques(ruta, filas=100_000):
+    """
+    Lee un .csv o .xlsx en bloques de 'filas' registros sin cargarlo completo
+    """
+    if ruta.lower().endswith('.csv'):
+        yield from pd.read_csv(ruta, chunksize=filas)
+        return
+
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        filas_hoja = hoja.iter_rows(values_only=True)
+        columnas = list(next(filas_hoja))
+        buffer = []
+        for fila in filas_hoja:
+            buffer.append(fila)
+            if len(buffer) >= filas:
+                yield pd.DataFrame(buffer, columns=columnas)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columnas)
+    finally:
+        libro.close()
+
+def imprimir_resumen(resumen, total_filas):
+    print(f"\n{'='*80}")
+    print(f"RESUMEN DE CONTROL DE CALIDAD")
+    print(f"{'='*80}")
+    print(f"📊 Registros evaluados: {total_filas:,}")
+    print(f"\n{'Variable':<20} {'Rango':>8} {'Pico':>8} {'Salto':>8} {'Plano':>8} {'Total':>8} {'%':>8}")
+    print(f"{'-'*80}")
+    for _, fila in resumen.iterrows():
+        print(f"{fila['Variable']:<20} {fila['Rango']:>8,} {fila['Pico']:>8,} {fila['Salto']:>8,} "
+              f"{fila['Plano']:>8,} {fila['Total']:>8,} {fila['Porcentaje']:>7.2f}%")
+    print(f"{'='*80}")
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Control de calidad de datos meteorológicos (.xlsx o .csv)')
+    parser.add_argument('archivo', help='Archivo de entrada')
+    parser.add_argument('--bloques', type=int, metavar='FILAS',
+                        help='Procesar por bloques de FILAS registros (entradas grandes)')
+    parser.add_argument('--salida', help='CSV de salida con todos los registros y la columna QC')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archivo):
+        print(f"❌ Error: El archivo '{args.archivo}' no existe.")
+        sys.exit(1)
+
+    print(f"📁 Archivo: {args.archivo}")
+
+    if args.bloques:
+        def guardar_partes(partes):
+            encabezado = True
+            for parte in partes:
+                if args.salida:
+                    parte.to_csv(args.salida, mode='w' if encabezado else 'a', header=encabezado,
+                                 index=False, encoding='utf-8')
+                    encabezado = False
+                yield parte
+
+        resumen, total = resumen_por_bloques(
+            guardar_partes(controlar_por_bloques(leer_por_bloques(args.archivo, args.bloques))))
+        if resumen is None:
+            print("❌ El archivo no contiene registros.")
+            return
+    else:
+        df = controlar_calidad(leer_cacheado(args.archivo))
+        total = len(df)
+        resumen = resumen_calidad(df)
+        if args.salida:
+            df.to_csv(args.salida, index=False, encoding='utf-8')
+
+    imprimir_resumen(resumen, total)
+
+    nombre_resumen = f"Calidad_{os.path.splitext(os.path.basename(args.archivo))[0]}.csv"
+    resumen.to_csv(nombre_resumen, index=False, encoding='utf-8')
+    print(f"✓ Resumen guardado en: {nombre_resumen}")
+    if args.salida:
+        print(f"✓ Registros con columna QC guardados en: {args.salida}")
+
+if __name__ == "__main__":
+    main()
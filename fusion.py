@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén deduplicado de extracciones: fusiona lotes nuevos (upsert) por
+(Ciudad, Proveedor, Fecha/Hora) en particiones diarias, de modo que agregar
+un día cuesta O(día) y repetir una extracción no duplica horas
+Fecha: 2025-10-20
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utilidades import construir_marca_tiempo, leer_tabla
+
+POLITICAS = ('ultimo', 'calidad')
+
+def _limpiar(nombre):
+    """
+    Sanitiza un nombre para usarlo como directorio (igual que los nombres de archivo de los extractores)
+    """
+    return ''.join(c if c.isalnum() or c in ('_', '-') else '_' for c in str(nombre))
+
+def ruta_particion(raiz, proveedor, ciudad, dia):
+    """
+    Ruta del CSV que guarda un día de una ciudad y un proveedor:
+    raiz/proveedor/ciudad/YYYY/YYYY-MM-DD.csv
+    """
+    return os.path.join(raiz, _limpiar(proveedor), _limpiar(ciudad), f"{dia:%Y}", f"{dia:%Y-%m-%d}.csv")
+
+def _contar_bits(qc):
+    """
+    Número de banderas activas por fila en una columna QC (uint64)
+    """
+    bytes_qc = np.ascontiguousarray(qc, dtype=np.uint64).view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(bytes_qc, axis=1).sum(axis=1)
+
+def _fusionar_particion(existente, lote, politica):
+    """
+    Fusiona un día ya guardado con las filas nuevas del mismo día
+    (el lote trae su marca de tiempo en la columna '_marca')
+
+    Returns:
+        tuple: (DataFrame fusionado y ordenado, insertados, reemplazados, conservados);
+               conservados incluye las filas reescritas con valores idénticos
+    """
+    lote = lote.assign(_origen=1)
+    if existente is None or existente.empty:
+        combinado = lote
+    else:
+        existente = existente.assign(_origen=0, _marca=construir_marca_tiempo(existente))
+        combinado = pd.concat([existente, lote], ignore_index=True)
+    combinado['_posicion'] = np.arange(len(combinado))
+
+    if politica == 'calidad':
+        # Mejor calidad: menos banderas QC, luego menos valores faltantes; a igualdad gana lo más reciente
+        variables = [c for c in combinado.columns
+                     if c not in ('Ciudad', 'Proveedor', 'Fecha', 'Hora', 'QC') and not c.startswith('_')]
+        combinado['_faltantes'] = combinado[variables].isna().sum(axis=1)
+        combinado['_banderas'] = (_contar_bits(combinado['QC'].fillna(0).to_numpy(dtype=np.uint64))
+                                  if 'QC' in combinado.columns else 0)
+        orden = ['_marca', '_banderas', '_faltantes', '_posicion']
+        ascendente = [True, True, True, False]
+    else:
+        # Última escritura gana: entre filas con la misma marca, la última posición
+        orden = ['_marca', '_posicion']
+        ascendente = [True, False]
+
+    combinado = combinado.sort_values(orden, ascending=ascendente, kind='stable')
+    ganadores = combinado.drop_duplicates('_marca', keep='first')
+
+    existentes = combinado[combinado['_origen'] == 0].set_index('_marca')
+    del_lote = ganadores['_origen'] == 1
+    coinciden = del_lote & ganadores['_marca'].isin(existentes.index)
+    insertados = int((del_lote & ~coinciden).sum())
+
+    # Una fila nueva idéntica a la guardada no cuenta como cambio (reejecuciones idempotentes)
+    nuevas = ganadores[coinciden].set_index('_marca')
+    columnas = [c for c in nuevas.columns if c in existentes.columns and not c.startswith('_')]
+    previas = existentes.loc[nuevas.index, columnas]
+    iguales = ((nuevas[columnas] == previas) | (nuevas[columnas].isna() & previas.isna())).all(axis=1)
+    reemplazados = int((~iguales).sum())
+    conservados = len(existentes) - reemplazados
+
+    resultado = ganadores.drop(columns=[c for c in ganadores.columns if c.startswith('_')])
+    return resultado.reset_index(drop=True), insertados, reemplazados, conservados
+
+def guardar_lote(df, raiz, proveedor, politica='ultimo'):
+    """
+    Fusiona un lote nuevo en el almacén. Sólo se leen y reescriben las
+    particiones (días) presentes en el lote.
+
+    Args:
+        df (DataFrame): Datos en el formato unificado (Ciudad, Fecha, Hora, ...)
+        raiz (str): Directorio del almacén
+        proveedor (str): Nombre del proveedor ('weatherapi', 'meteostat', ...)
+        politica (str): 'ultimo' (la última escritura gana) o 'calidad'
+                        (gana la fila con menos banderas QC y menos faltantes)
+
+    Returns:
+        dict: Conteos de filas insertadas, reemplazadas y conservadas y particiones escritas
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política desconocida: '{politica}'. Opciones: {', '.join(POLITICAS)}")
+
+    estadisticas = {'insertados': 0, 'reemplazados': 0, 'conservados': 0, 'particiones': 0}
+    if df is None or df.empty:
+        return estadisticas
+
+    lote = df.copy()
+    if 'Ciudad' not in lote.columns:
+        lote['Ciudad'] = ''
+    lote['Proveedor'] = proveedor
+    lote['_marca'] = construir_marca_tiempo(lote)
+    lote = lote[lote['_marca'].notna()]
+
+    for (ciudad, d), parte in lote.groupby([lote['Ciudad'], lote['_marca'].dt.floor('D')], sort=True):
+        ruta = ruta_particion(raiz, proveedor, ciudad, d)
+        if not os.path.exists(ruta) and parte['_marca'].is_unique:
+            # Día nuevo sin duplicados internos: no hay nada que fusionar
+            fusionado = parte.sort_values('_marca').drop(columns='_marca')
+            insertados, reemplazados, conservados = len(parte), 0, 0
+        else:
+            existente = pd.read_csv(ruta, encoding='utf-8', dtype={'Fecha': str, 'Hora': str}) \
+                if os.path.exists(ruta) else None
+            fusionado, insertados, reemplazados, conservados = _fusionar_particion(existente, parte, politica)
+        estadisticas['insertados'] += insertados
+        estadisticas['reemplazados'] += reemplazados
+        estadisticas['conservados'] += conservados
+        if insertados == 0 and reemplazados == 0:
+            continue
+
+        # Escritura atómica: un fallo a mitad de camino no deja la partición corrupta
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = ruta + '.tmp'
+        fusionado.to_csv(temporal, index=False, encoding='utf-8')
+        os.replace(temporal, ruta)
+        estadisticas['particiones'] += 1
+
+    return estadisticas
+
+def leer_almacen(raiz, proveedor=None, ciudad=None, desde=None, hasta=None):
+    """
+    Lee el almacén (o una parte) como un solo DataFrame ordenado
+
+    Args:
+        raiz (str): Directorio del almacén
+        proveedor (str): Filtrar por proveedor
+        ciudad (str): Filtrar por ciudad
+        desde (datetime): Primer día a incluir
+        hasta (datetime): Último día a incluir
+    """
+    desde = pd.Timestamp(desde).floor('D') if desde is not None else None
+    hasta = pd.Timestamp(hasta).floor('D') if hasta is not None else None
+    proveedores = [_limpiar(proveedor)] if proveedor else sorted(os.listdir(raiz)) if os.path.isdir(raiz) else []
+
+    partes = []
+    for p in proveedores:
+        dir_proveedor = os.path.join(raiz, p)
+        ciudades = [_limpiar(ciudad)] if ciudad else sorted(os.listdir(dir_proveedor)) \
+            if os.path.isdir(dir_proveedor) else []
+        for c in ciudades:
+            for actual, _, archivos in sorted(os.walk(os.path.join(dir_proveedor, c))):
+                for archivo in sorted(archivos):
+                    if not archivo.endswith('.csv'):
+                        continue
+                    d = pd.Timestamp(archivo[:-4])
+                    if (desde is not None and d < desde) or (hasta is not None and d > hasta):
+                        continue
+                    partes.append(pd.read_csv(os.path.join(actual, archivo), encoding='utf-8',
+                                              dtype={'Fecha': str, 'Hora': str}))
+
+    if not partes:
+        return pd.DataFrame(columns=['Ciudad', 'Proveedor', 'Fecha', 'Hora'])
+    return pd.concat(partes, ignore_index=True)
+
+def main():
+    """
+    Función principal: fusiona uno o varios archivos en el almacén
+    """
+    parser = argparse.ArgumentParser(description='Fusiona extracciones en un almacén deduplicado')
+    parser.add_argument('archivos', nargs='+', help='Archivos .xlsx o .csv a fusionar (en orden)')
+    parser.add_argument('--almacen', required=True, help='Directorio del almacén')
+    parser.add_argument('--proveedor', required=True, help="Proveedor de los datos ('weatherapi', 'meteostat', ...)")
+    parser.add_argument('--politica', choices=POLITICAS, default='ultimo')
+    args = parser.parse_args()
+
+    for archivo in args.archivos:
+        if not os.path.exists(archivo):
+            print(f"❌ Error: El archivo '{archivo}' no existe.")
+            sys.exit(1)
+
+    for archivo in args.archivos:
+        e = guardar_lote(leer_tabla(archivo), args.almacen, args.proveedor, args.politica)
+        print(f"✓ {archivo}: {e['insertados']:,} insertados, {e['reemplazados']:,} reemplazados, "
+              f"{e['conservados']:,} conservados ({e['particiones']:,} días escritos)")
+
+if __name__ == "__main__":
+    main()
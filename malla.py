@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extracción sobre una malla de puntos (bbox del área metropolitana). Cada
+celda se ajusta a la resolución real del proveedor (ubicación más cercana de
+WeatherAPI, estación más cercana de Meteostat), cada fuente única se consulta
+una sola vez y sus datos se reparten a todas las celdas que la comparten
+Fecha: 2025-10-20
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from cache_columnar import directorio_cache
+from orquestador import ErrorDefinitivo
+
+# Área metropolitana de Bucaramanga (Bucaramanga, Floridablanca, Girón, Piedecuesta):
+# (lat_min, lon_min, lat_max, lon_max)
+BBOX_AREA_METROPOLITANA = (6.95, -73.20, 7.20, -73.00)
+
+URL_BUSQUEDA = "http://api.weatherapi.com/v1/search.json"
+
+KM_POR_GRADO = 111.32
+
+def generar_malla(bbox=BBOX_AREA_METROPOLITANA, resolucion_km=2.0, prefijo='Malla'):
+    """
+    Centros de las celdas de una malla regular sobre el bbox
+
+    Args:
+        bbox (tuple): (lat_min, lon_min, lat_max, lon_max)
+        resolucion_km (float): Lado de cada celda en km
+        prefijo (str): Prefijo del nombre de las celdas
+
+    Returns:
+        DataFrame: Celda, Latitud, Longitud (una fila por celda)
+    """
+    lat_min, lon_min, lat_max, lon_max = bbox
+    if lat_min >= lat_max or lon_min >= lon_max:
+        raise ValueError(f"bbox inválido: {bbox} (se espera lat_min, lon_min, lat_max, lon_max)")
+    paso_lat = resolucion_km / KM_POR_GRADO
+    paso_lon = resolucion_km / (KM_POR_GRADO * np.cos(np.deg2rad((lat_min + lat_max) / 2)))
+
+    lats = np.arange(lat_min + paso_lat / 2, lat_max, paso_lat)
+    lons = np.arange(lon_min + paso_lon / 2, lon_max, paso_lon)
+    filas, columnas = np.meshgrid(np.arange(len(lats)), np.arange(len(lons)), indexing='ij')
+    filas, columnas = filas.ravel(), columnas.ravel()
+    return pd.DataFrame({
+        'Celda': [f"{prefijo}_{f:02d}_{c:02d}" for f, c in zip(filas, columnas)],
+        'Latitud': lats[filas].round(4),
+        'Longitud': lons[columnas].round(4),
+    })
+
+def fuente_weatherapi(lat, lon, api_key, url_busqueda=URL_BUSQUEDA, timeout=30):
+    """
+    Ubicación de WeatherAPI más cercana a un punto (search.json)
+
+    Returns:
+        dict | None: fuente con 'id', 'nombre', 'lat', 'lon' o None si no hay ninguna
+    """
+    import requests
+
+    response = requests.get(url_busqueda, params={'key': api_key, 'q': f"{lat},{lon}"}, timeout=timeout)
+    if response.status_code == 401:
+        raise ErrorDefinitivo("API key inválida o no autorizada")
+    response.raise_for_status()
+    ubicaciones = response.json()
+    if not ubicaciones:
+        return None
+    u = ubicaciones[0]
+    return {'id': f"id:{u['id']}", 'nombre': u.get('name', str(u['id'])), 'lat': u['lat'], 'lon': u['lon']}
+
+def fuente_meteostat(lat, lon):
+    """
+    Estación de Meteostat más cercana a un punto
+    """
+    try:
+        from meteostat import Stations
+    except ImportError as e:
+        raise ErrorDefinitivo(f"meteostat no está instalado ({e})")
+
+    estaciones = Stations().nearby(lat, lon).fetch(1)
+    if estaciones.empty:
+        return None
+    e = estaciones.iloc[0]
+    return {'id': str(estaciones.index[0]), 'nombre': e['name'], 'lat': float(e['latitude']),
+            'lon': float(e['longitude']), 'alt': float(e['elevation'])}
+
+def asignar_fuentes(celdas, proveedor, api_key=None, url_busqueda=URL_BUSQUEDA, hilos=4):
+    """
+    Ajusta cada celda a la fuente efectiva del proveedor. Las búsquedas se
+    guardan en la caché (fuentes.json) para no repetirlas entre ejecuciones;
+    las que fallan dejan su celda sin fuente y se repiten en la próxima.
+
+    Returns:
+        DataFrame: celdas con las columnas Fuente, Nombre Fuente, Latitud Fuente,
+                   Longitud Fuente y Altitud Fuente (sin las celdas que no tienen fuente)
+
+    Raises:
+        ErrorDefinitivo: API key inválida o dependencia faltante (se guardan las búsquedas hechas)
+    """
+    if proveedor == 'weatherapi':
+        buscar = lambda lat, lon: fuente_weatherapi(lat, lon, api_key, url_busqueda)
+    elif proveedor == 'meteostat':
+        buscar = fuente_meteostat
+    else:
+        raise ValueError(f"Proveedor desconocido: '{proveedor}'")
+
+    cache = directorio_cache()
+    ruta_cache = os.path.join(cache, 'fuentes.json')
+    try:
+        with open(ruta_cache, encoding='utf-8') as f:
+            conocidas = json.load(f)
+    except (OSError, ValueError):
+        conocidas = {}
+
+    # Las búsquedas contra otro servidor (p. ej. servidor_stub.py) no se mezclan con las reales
+    origen = f"{proveedor}@{url_busqueda}" if proveedor == 'weatherapi' and url_busqueda != URL_BUSQUEDA else proveedor
+    claves = [f"{origen}|{lat:.4f},{lon:.4f}" for lat, lon in zip(celdas['Latitud'], celdas['Longitud'])]
+    pendientes = {c: (lat, lon) for c, lat, lon in zip(claves, celdas['Latitud'], celdas['Longitud'])
+                  if c not in conocidas}
+    errores = {}
+    if pendientes:
+        try:
+            with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+                futuros = {ejecutor.submit(buscar, lat, lon): c for c, (lat, lon) in pendientes.items()}
+                for futuro in as_completed(futuros):
+                    try:
+                        conocidas[futuros[futuro]] = futuro.result()
+                    except ErrorDefinitivo:
+                        # Como en el orquestador: reintentar no lo arregla, se cancela el resto
+                        for f in futuros:
+                            f.cancel()
+                        raise
+                    except Exception as e:
+                        errores[futuros[futuro]] = e
+        finally:
+            # Lo encontrado hasta aquí se guarda aunque la asignación se interrumpa
+            os.makedirs(cache, exist_ok=True)
+            temporal = ruta_cache + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(conocidas, f, ensure_ascii=False)
+            os.replace(temporal, ruta_cache)
+
+    if errores:
+        sin_fuente = sum(c in errores for c in claves)
+        print(f"⚠️  {proveedor}: {len(errores):,} búsquedas fallidas, {sin_fuente:,} celdas quedan sin fuente "
+              f"(primer error: {next(iter(errores.values()))})")
+
+    fuentes = [conocidas.get(c) for c in claves]
+    mapa = celdas.assign(**{
+        'Fuente': [f['id'] if f else None for f in fuentes],
+        'Nombre Fuente': [f['nombre'] if f else None for f in fuentes],
+        'Latitud Fuente': [f['lat'] if f else np.nan for f in fuentes],
+        'Longitud Fuente': [f['lon'] if f else np.nan for f in fuentes],
+        'Altitud Fuente': [f.get('alt', np.nan) if f else np.nan for f in fuentes],
+    })
+    return mapa[mapa['Fuente'].notna()].reset_index(drop=True)
+
+def ubicaciones_unicas(mapa, proveedor):
+    """
+    Una ubicación del orquestador por fuente única (la 'ciudad' es el id de la fuente)
+    """
+    ubicaciones = []
+    for fila in mapa.drop_duplicates('Fuente').to_dict('records'):
+        u = {'ciudad': fila['Fuente'], 'lat': fila['Latitud Fuente'], 'lon': fila['Longitud Fuente'],
+             'alt': None if pd.isna(fila['Altitud Fuente']) else fila['Altitud Fuente']}
+        if proveedor == 'weatherapi':
+            u['q'] = fila['Fuente']
+        else:
+            u['estacion'] = fila['Fuente']
+        ubicaciones.append(u)
+    return ubicaciones
+
+def expandir(datos, mapa):
+    """
+    Reparte los datos de cada fuente a todas sus celdas: Ciudad pasa a ser el
+    nombre de la celda y se agregan Latitud, Longitud y Fuente al final
+    """
+    celdas_por_fuente = mapa.groupby('Fuente', sort=False).indices
+    filas, celdas = [], []
+    for fuente, posiciones in datos.groupby('Ciudad', sort=False).indices.items():
+        destino = celdas_por_fuente.get(fuente)
+        if destino is None:
+            continue
+        # Todas las filas de la fuente, repetidas una vez por celda
+        filas.append(np.tile(posiciones, len(destino)))
+        celdas.append(np.repeat(destino, len(posiciones)))
+    filas = np.concatenate(filas) if filas else np.array([], dtype=np.int64)
+    celdas = np.concatenate(celdas) if celdas else np.array([], dtype=np.int64)
+
+    resultado = datos.iloc[filas].reset_index(drop=True)
+    resultado['Fuente'] = resultado['Ciudad']
+    resultado['Ciudad'] = mapa['Celda'].to_numpy()[celdas]
+    resultado['Latitud'] = mapa['Latitud'].to_numpy()[celdas]
+    resultado['Longitud'] = mapa['Longitud'].to_numpy()[celdas]
+    return resultado[[c for c in datos.columns] + ['Latitud', 'Longitud', 'Fuente']]
+
+def extraer_malla(celdas, fecha_inicio, fecha_fin, proveedores=('weatherapi', 'meteostat'), api_key=None,
+                  base_url=None, url_busqueda=URL_BUSQUEDA, almacen=None, politica='ultimo', concurrencia=None,
+                  derivadas=None, **opciones):
+    """
+    Extrae todos los proveedores sobre la malla consultando cada fuente única una sola vez
+
+    Args:
+        celdas (DataFrame): Resultado de generar_malla (Celda, Latitud, Longitud)
+        fecha_inicio (datetime): Fecha de inicio
+        fecha_fin (datetime): Fecha de fin
+        proveedores (tuple): Proveedores a consultar
+        api_key (str): API key de WeatherAPI
+        base_url (str): URL de history.json (permite usar servidor_stub.py)
+        url_busqueda (str): URL de search.json
+        almacen (str): Directorio del almacén deduplicado (las celdas se guardan como ciudades,
+                       a medida que llega cada fuente); sin él los datos se devuelven en memoria
+        politica (str): Regla de fusión en el almacén
+        concurrencia (dict): Solicitudes simultáneas por proveedor
+        derivadas (bool | list): Variables derivadas (se calculan una vez por fuente)
+        **opciones: Resto de parámetros de orquestador.orquestar (umbral_fallos, timeout...)
+
+    Returns:
+        tuple: (dict proveedor -> DataFrame por celda o None, dict proveedor -> resumen)
+    """
+    import orquestador
+
+    mapas, ubicaciones, disponibles = {}, {}, []
+    for p in proveedores:
+        try:
+            mapas[p] = asignar_fuentes(celdas, p, api_key, url_busqueda,
+                                       hilos=(concurrencia or {}).get(p, orquestador.CONCURRENCIA[p]))
+        except ErrorDefinitivo as e:
+            print(f"❌ {p}: no se pueden buscar fuentes ({e}). Se omite el proveedor.")
+            continue
+        ubicaciones[p] = ubicaciones_unicas(mapas[p], p)
+        disponibles.append(p)
+        print(f"✓ {p}: {len(celdas):,} celdas → {len(ubicaciones[p]):,} fuentes únicas "
+              f"(factor de duplicación {len(mapas[p]) / max(len(ubicaciones[p]), 1):.1f})")
+    if not disponibles:
+        return {}, {}
+
+    # Cada lote (una fuente) se reparte a sus celdas en el escritor del orquestador,
+    # así con almacén sólo queda en memoria el lote que se está guardando
+    resultado, resumen = orquestador.orquestar(
+        ubicaciones, fecha_inicio, fecha_fin, disponibles, api_key, base_url, almacen, politica,
+        concurrencia, derivadas=derivadas, transformar=lambda p, df: expandir(df, mapas[p]), **opciones)
+
+    for p in disponibles:
+        resumen[p]['celdas'] = len(mapas[p])
+        resumen[p]['fuentes'] = len(ubicaciones[p])
+    return resultado, resumen
+
+def main():
+    """
+    Función principal (equivale a `bucarapi.py fetch-grid`)
+    """
+    import bucarapi
+    sys.exit(bucarapi.main(['fetch-grid', *sys.argv[1:]]))
+
+if __name__ == "__main__":
+    main()
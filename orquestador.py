@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extracción concurrente de varios proveedores y ubicaciones con asyncio:
+límite de concurrencia y circuit breaker por proveedor, y los resultados se
+escriben a medida que llegan (un proveedor lento no detiene a los demás)
+Fecha: 2025-10-20
+"""
+
+import argparse
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Solicitudes simultáneas por proveedor
+CONCURRENCIA = {'weatherapi': 4, 'meteostat': 2}
+
+# Lotes que pueden esperar al escritor; con la cola llena los trabajadores esperan
+LOTES_EN_COLA = 16
+
+UBICACION_DEFECTO = {'ciudad': 'Bucaramanga', 'lat': 7.1193, 'lon': -73.1227, 'alt': 959}
+
+class ErrorTransitorio(Exception):
+    """5xx, timeout o error de conexión: se reintenta y cuenta para el circuito"""
+
+class LimiteRate(Exception):
+    """429: se espera y se reintenta sin abrir el circuito"""
+
+class ErrorDefinitivo(Exception):
+    """Error que no se arregla reintentando (API key inválida, dependencia faltante)"""
+
+class Circuito:
+    """
+    Circuit breaker de un proveedor. Tras `umbral` fallos transitorios seguidos
+    se abre y nadie consulta ese proveedor durante `pausa` segundos; luego deja
+    pasar una sola solicitud de prueba (semiabierto): si funciona se cierra,
+    si falla vuelve a abrirse.
+    """
+
+    def __init__(self, nombre, umbral=5, pausa=60):
+        self.nombre = nombre
+        self.umbral = umbral
+        self.pausa = pausa
+        self.fallos = 0
+        self.aperturas = 0
+        self.abierto_hasta = None
+        self.sondeando = False
+        self.cancelado = False
+        self._cambio = asyncio.Event()
+
+    def _notificar(self):
+        self._cambio.set()
+        self._cambio = asyncio.Event()
+
+    async def permitir(self):
+        """
+        Espera a que el circuito deje pasar una solicitud
+
+        Returns:
+            bool: False si el proveedor fue cancelado por un error definitivo
+        """
+        loop = asyncio.get_running_loop()
+        while not self.cancelado:
+            if self.abierto_hasta is None:
+                return True
+            espera = self.abierto_hasta - loop.time()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            elif not self.sondeando:
+                self.sondeando = True
+                return True
+            else:
+                await self._cambio.wait()
+        return False
+
+    def exito(self):
+        if self.abierto_hasta is not None:
+            print(f"✓ {self.nombre}: circuito cerrado")
+        self.fallos = 0
+        self.abierto_hasta = None
+        self.sondeando = False
+        self._notificar()
+
+    def fallo(self):
+        if self.abierto_hasta is not None and not self.sondeando:
+            # Solicitud que ya estaba en curso cuando se abrió el circuito
+            return
+        self.fallos += 1
+        if self.sondeando or self.fallos >= self.umbral:
+            self.abierto_hasta = asyncio.get_running_loop().time() + self.pausa
+            self.aperturas += 1
+            self.sondeando = False
+            print(f"⚠️  {self.nombre}: circuito abierto tras {self.fallos} fallos seguidos, pausa de {self.pausa} s")
+            self._notificar()
+
+    def cancelar(self):
+        self.cancelado = True
+        self._notificar()
+
+    def sin_veredicto(self, sonda):
+        """
+        Respuesta que no dice nada de la salud del proveedor (429, respuesta
+        inesperada): el estado no cambia, salvo que si era la solicitud de prueba
+        se libera el turno para que otra vuelva a probar
+        """
+        if sonda and self.sondeando:
+            self.sondeando = False
+            self._notificar()
+
+    def vigente(self, sonda):
+        """
+        Comprueba, ya con el cupo del semáforo, que la solicitud sigue permitida:
+        el circuito pudo abrirse o cancelarse mientras se esperaba el cupo
+        (la solicitud de prueba es la única que pasa con el circuito abierto)
+        """
+        return not self.cancelado and (self.abierto_hasta is None or sonda)
+
+def consultar_weatherapi(ubicacion, dia, api_key, base_url, timeout):
+    """
+    Un día de WeatherAPI para una ubicación (función bloqueante, corre en un hilo)
+    """
+    import requests
+    import API_WeatherAPI
+
+    params = {'key': api_key, 'q': ubicacion.get('q') or f"{ubicacion['lat']},{ubicacion['lon']}",
+              'dt': dia.strftime('%Y-%m-%d'), 'hour': 'all'}
+    try:
+        response = requests.get(base_url, params=params, timeout=timeout)
+    except requests.RequestException as e:
+        raise ErrorTransitorio(str(e))
+
+    if response.status_code == 200:
+        data = response.json()
+        registros = [API_WeatherAPI.extraer_registro(hour)
+                     for day in data.get('forecast', {}).get('forecastday', []) for hour in day['hour']]
+        return API_WeatherAPI.construir_dataframe(registros, ubicacion['ciudad']) if registros else None
+    if response.status_code == 400:
+        print(f"⚠️  weatherapi: No hay datos disponibles para {ubicacion['ciudad']} {params['dt']}")
+        return None
+    if response.status_code == 401:
+        raise ErrorDefinitivo("API key inválida o no autorizada")
+    if response.status_code == 429:
+        raise LimiteRate()
+    raise ErrorTransitorio(f"HTTP {response.status_code}")
+
+def consultar_meteostat(ubicacion, fecha_inicio, fecha_fin):
+    """
+    Todo el período de Meteostat para una ubicación (función bloqueante)
+    """
+    try:
+        from meteostat import Point, Hourly
+    except ImportError as e:
+        raise ErrorDefinitivo(f"meteostat no está instalado ({e})")
+    import API_meteostat
+
+    # Una estación concreta (modo malla) o el punto interpolado por Meteostat
+    lugar = ubicacion.get('estacion') or Point(ubicacion['lat'], ubicacion['lon'], ubicacion.get('alt'))
+    try:
+        data = Hourly(lugar, fecha_inicio, fecha_fin).fetch()
+    except Exception as e:
+        raise ErrorTransitorio(str(e))
+    return None if data.empty else API_meteostat.normalizar_datos(data, ubicacion['ciudad'])
+
+def unidades_de_trabajo(proveedor, ubicaciones, fecha_inicio, fecha_fin):
+    """
+    Divide la extracción de un proveedor en solicitudes independientes:
+    un día por ubicación en WeatherAPI, todo el período por ubicación en Meteostat
+
+    Returns:
+        list: (etiqueta, argumentos de la función de consulta)
+    """
+    if proveedor == 'weatherapi':
+        dias = [fecha_inicio + timedelta(days=i) for i in range((fecha_fin - fecha_inicio).days + 1)]
+        return [(f"{u['ciudad']} {d:%Y-%m-%d}", (u, d)) for u in ubicaciones for d in dias]
+    if proveedor == 'meteostat':
+        return [(u['ciudad'], (u, fecha_inicio, fecha_fin)) for u in ubicaciones]
+    raise ValueError(f"Proveedor desconocido: '{proveedor}'. Opciones: {', '.join(CONCURRENCIA)}")
+
+async def _trabajador(proveedor, etiqueta, consulta, circuito, semaforo, ejecutor, cola, resumen,
+                      timeout, reintentos, espera_rate_limit):
+    loop = asyncio.get_running_loop()
+    intentos = 0
+    while intentos <= reintentos:
+        if not await circuito.permitir():
+            break
+        # Con el circuito abierto, permitir() sólo deja pasar la solicitud de prueba
+        sonda = circuito.abierto_hasta is not None
+        try:
+            async with semaforo:
+                if not circuito.vigente(sonda):
+                    # Se libera el cupo sin consultar y se vuelve a esperar al circuito
+                    continue
+                intentos += 1
+                # timeout también aquí: Meteostat no acepta uno propio
+                df = await asyncio.wait_for(loop.run_in_executor(ejecutor, consulta), timeout)
+        except LimiteRate:
+            # Un 429 no es ni éxito ni fallo: no reinicia la cuenta de fallos seguidos
+            # (un proveedor que alterna 500 y 429 debe abrir su circuito).
+            # La espera ocurre fuera del semáforo para no ocupar un cupo.
+            circuito.sin_veredicto(sonda)
+            print(f"⚠️  {proveedor}: Límite de rate alcanzado. Esperando {espera_rate_limit} segundos...")
+            await asyncio.sleep(espera_rate_limit)
+            continue
+        except (ErrorTransitorio, asyncio.TimeoutError) as e:
+            circuito.fallo()
+            print(f"❌ {proveedor} {etiqueta}: {str(e) or 'timeout'}")
+            continue
+        except ErrorDefinitivo as e:
+            if not circuito.cancelado:
+                print(f"❌ {proveedor}: {e}. Se cancela el proveedor.")
+                circuito.cancelar()
+            break
+        except Exception as e:
+            # Respuesta inesperada (JSON inválido, campos faltantes...): el proveedor
+            # respondió, así que no cuenta para el circuito, y reintentar no la arregla
+            circuito.sin_veredicto(sonda)
+            print(f"❌ {proveedor} {etiqueta}: respuesta inesperada ({type(e).__name__}: {e})")
+            break
+
+        circuito.exito()
+        resumen['completadas'] += 1
+        if df is not None:
+            resumen['registros'] += len(df)
+            await cola.put((proveedor, df))
+        return
+    resumen['fallidas'] += 1
+
+def _procesar_lote(proveedor, df, almacen, politica, derivadas, transformar):
+    """
+    Derivadas, transformación y fusión de un lote (bloqueante, corre en un hilo)
+
+    Returns:
+        tuple: (DataFrame procesado, estadísticas de fusion.guardar_lote o None sin almacén)
+    """
+    import fusion
+    from variables_derivadas import calcular_derivadas
+
+    if derivadas:
+        df = calcular_derivadas(df, None if derivadas is True else derivadas)
+    if transformar:
+        df = transformar(proveedor, df)
+    if not almacen:
+        return df, None
+    return df, fusion.guardar_lote(df, almacen, proveedor, politica)
+
+async def _escritor(cola, almacen, politica, derivadas, transformar, resumen, datos):
+    """
+    Único consumidor de la cola: procesa cada lote en un hilo, sin bloquear el
+    bucle (un lote de Meteostat repartido a muchas celdas puede tener millones
+    de filas), y lo fusiona en el almacén o lo acumula en memoria
+    """
+    while True:
+        elemento = await cola.get()
+        if elemento is None:
+            return
+        proveedor, df = elemento
+        df, e = await asyncio.to_thread(_procesar_lote, proveedor, df, almacen, politica, derivadas, transformar)
+        if e is None:
+            datos[proveedor].append(df)
+        else:
+            for clave in ('insertados', 'reemplazados', 'particiones'):
+                resumen[proveedor][clave] += e[clave]
+
+async def _orquestar(ubicaciones, fecha_inicio, fecha_fin, proveedores, consultas, almacen, politica,
+                     concurrencia, umbral_fallos, pausa_circuito, timeout, reintentos,
+                     espera_rate_limit, derivadas, transformar=None):
+    import pandas as pd
+
+    cola = asyncio.Queue(maxsize=LOTES_EN_COLA)
+    resumen = {p: {'unidades': 0, 'completadas': 0, 'fallidas': 0, 'registros': 0,
+                   'insertados': 0, 'reemplazados': 0, 'particiones': 0, 'aperturas': 0}
+               for p in proveedores}
+    datos = {p: [] for p in proveedores}
+    escritor = asyncio.create_task(_escritor(cola, almacen, politica, derivadas, transformar, resumen, datos))
+
+    circuitos = {}
+    ejecutores = {}
+    tareas = []
+    for p in proveedores:
+        circuitos[p] = Circuito(p, umbral_fallos, pausa_circuito)
+        semaforo = asyncio.Semaphore(concurrencia.get(p, 1))
+        # Hilos propios por proveedor: uno colgado no agota los hilos de los demás
+        ejecutores[p] = ThreadPoolExecutor(concurrencia.get(p, 1), thread_name_prefix=f'orquestador-{p}')
+        unidades = unidades_de_trabajo(p, ubicaciones[p] if isinstance(ubicaciones, dict) else ubicaciones,
+                                       fecha_inicio, fecha_fin)
+        resumen[p]['unidades'] = len(unidades)
+        for etiqueta, argumentos in unidades:
+            consulta = lambda f=consultas[p], a=argumentos: f(*a)
+            tareas.append(asyncio.create_task(_trabajador(
+                p, etiqueta, consulta, circuitos[p], semaforo, ejecutores[p], cola, resumen[p],
+                timeout, reintentos, espera_rate_limit)))
+
+    trabajadores = asyncio.gather(*tareas)
+    try:
+        await asyncio.wait({trabajadores, escritor}, return_when=asyncio.FIRST_COMPLETED)
+        if escritor.done():
+            # El escritor sólo termina antes que los trabajadores si falló: no se sigue descargando
+            trabajadores.cancel()
+            await asyncio.gather(trabajadores, return_exceptions=True)
+        else:
+            await trabajadores
+            await cola.put(None)
+        await escritor
+    finally:
+        for ejecutor in ejecutores.values():
+            # Sin esperar a las consultas que siguen colgadas tras su timeout
+            ejecutor.shutdown(wait=False, cancel_futures=True)
+
+    for p in proveedores:
+        resumen[p]['aperturas'] = circuitos[p].aperturas
+    tablas = {p: pd.concat(datos[p], ignore_index=True) if datos[p] else None for p in proveedores}
+    return tablas, resumen
+
+def orquestar(ubicaciones=None, fecha_inicio=None, fecha_fin=None, proveedores=('weatherapi', 'meteostat'),
+              api_key=None, base_url=None, almacen=None, politica='ultimo', concurrencia=None,
+              umbral_fallos=5, pausa_circuito=60, timeout=30, reintentos=3, espera_rate_limit=60,
+              derivadas=None, transformar=None):
+    """
+    Extrae todos los proveedores para todas las ubicaciones a la vez
+
+    Args:
+        ubicaciones (list | dict): dicts con 'ciudad', 'lat', 'lon' y 'alt' (por defecto Bucaramanga),
+                                  o un dict proveedor -> lista si cada proveedor consulta lugares distintos.
+                                  Opcionales: 'q' (consulta de WeatherAPI, p. ej. 'id:123') y 'estacion'
+                                  (id de estación de Meteostat)
+        fecha_inicio (datetime): Fecha de inicio
+        fecha_fin (datetime): Fecha de fin
+        proveedores (tuple): Proveedores a consultar ('weatherapi', 'meteostat')
+        api_key (str): API key de WeatherAPI
+        base_url (str): URL de history.json (permite usar servidor_stub.py)
+        almacen (str): Directorio del almacén deduplicado; sin él los datos se devuelven en memoria
+        politica (str): Regla de fusión en el almacén ('ultimo' o 'calidad')
+        concurrencia (dict): Solicitudes simultáneas por proveedor (por defecto CONCURRENCIA)
+        umbral_fallos (int): Fallos transitorios seguidos que abren el circuito de un proveedor
+        pausa_circuito (float): Segundos que el circuito permanece abierto
+        timeout (float): Segundos máximos por solicitud
+        reintentos (int): Reintentos por solicitud tras un fallo transitorio o un 429
+        espera_rate_limit (float): Segundos de espera tras una respuesta 429
+        derivadas (bool | list): Variables derivadas a agregar (True = todas las disponibles)
+        transformar (callable): Función (proveedor, df) -> df aplicada a cada lote, tras las
+                                derivadas y antes de guardarlo (p. ej. repartirlo a las celdas de una malla)
+
+    Returns:
+        tuple: (dict proveedor -> DataFrame o None, dict proveedor -> resumen de la ejecución)
+    """
+    import API_WeatherAPI
+
+    ubicaciones = ubicaciones or [UBICACION_DEFECTO]
+    fecha_inicio = fecha_inicio or datetime(2024, 12, 1)
+    fecha_fin = fecha_fin or datetime(2024, 12, 2)
+    base_url = base_url or API_WeatherAPI.URL_BASE
+    consultas = {
+        'weatherapi': lambda u, d: consultar_weatherapi(u, d, api_key, base_url, timeout),
+        'meteostat': consultar_meteostat,
+    }
+    return asyncio.run(_orquestar(
+        ubicaciones, fecha_inicio, fecha_fin, list(proveedores), consultas, almacen, politica,
+        {**CONCURRENCIA, **(concurrencia or {})}, umbral_fallos, pausa_circuito, timeout, reintentos,
+        espera_rate_limit, derivadas, transformar))
+
+def interpretar_ubicacion(texto):
+    """
+    'Ciudad:lat:lon[:alt]' -> dict de ubicación
+    """
+    partes = texto.split(':')
+    if len(partes) not in (3, 4):
+        raise argparse.ArgumentTypeError(f"ubicación inválida '{texto}' (formato Ciudad:lat:lon[:alt])")
+    try:
+        return {'ciudad': partes[0], 'lat': float(partes[1]), 'lon': float(partes[2]),
+                'alt': float(partes[3]) if len(partes) == 4 else None}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"coordenadas inválidas en '{texto}'")
+
+def interpretar_bbox(texto):
+    """
+    'lat_min,lon_min,lat_max,lon_max' -> tupla de floats
+    """
+    try:
+        bbox = tuple(float(x) for x in texto.split(','))
+    except ValueError:
+        bbox = ()
+    if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+        raise argparse.ArgumentTypeError(f"bbox inválido '{texto}' (formato lat_min,lon_min,lat_max,lon_max)")
+    return bbox
+
+def imprimir_resumen(resumen):
+    print(f"\n{'Proveedor':<12} {'Solicitudes':>11} {'OK':>6} {'Fallidas':>8} {'Registros':>10} "
+          f"{'Insertados':>10} {'Aperturas':>9}")
+    print("-" * 72)
+    for p, r in resumen.items():
+        print(f"{p:<12} {r['unidades']:>11,} {r['completadas']:>6,} {r['fallidas']:>8,} {r['registros']:>10,} "
+              f"{r['insertados']:>10,} {r['aperturas']:>9,}")
+
+def main():
+    """
+    Función principal (equivale a `bucarapi.py fetch-all`)
+    """
+    import bucarapi
+    sys.exit(bucarapi.main(['fetch-all', *sys.argv[1:]]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilado opcional de las funciones principales: tiempos de pared y CPU por
+etapa, cProfile, tracemalloc y un volcado de pilas para flamegraph.
+Se activa con la variable BUCARAPI_PERFIL o con `bucarapi.py --perfil`;
+desactivado, cada función instrumentada sólo paga una comprobación booleana.
+
+    BUCARAPI_PERFIL=1                        tiempos por etapa
+    BUCARAPI_PERFIL=cprofile,memoria         además cProfile (.prof) y memoria pico
+    BUCARAPI_PERFIL=flamegraph               además pilas muestreadas (.folded)
+    BUCARAPI_PERFIL=todo                     todo lo anterior
+
+Los archivos se escriben en BUCARAPI_PERFIL_DIR (por defecto el directorio actual).
+Fecha: 2025-10-20
+"""
+
+import atexit
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+MODOS = ('tiempos', 'cprofile', 'memoria', 'flamegraph')
+INTERVALO_MUESTREO = 0.005
+
+ACTIVO = False
+modos = set()
+
+_NULO = contextlib.nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+_estadisticas = {}
+_perfilador = None
+_capturas = 0
+_hilos_capturados = Counter()
+_pilas = Counter()
+_muestreador = None
+
+def activar(texto='tiempos'):
+    """
+    Activa el perfilado. `texto` es una lista de modos separada por comas
+    ('1' o '' equivalen a 'tiempos'; 'todo' activa todos los modos)
+    """
+    global ACTIVO, _perfilador, _muestreador
+    pedidos = {m.strip().lower() for m in str(texto).split(',') if m.strip()} - {'1', 'tiempos'}
+    if 'todo' in pedidos:
+        pedidos = set(MODOS)
+    desconocidos = pedidos - set(MODOS)
+    if desconocidos:
+        raise ValueError(f"Modo de perfilado desconocido: {', '.join(sorted(desconocidos))}. "
+                         f"Opciones: {', '.join(MODOS)}, todo")
+    if ACTIVO:
+        return
+    modos.update(pedidos | {'tiempos'})
+    ACTIVO = True
+
+    if 'cprofile' in modos:
+        import cProfile
+        _perfilador = cProfile.Profile()
+    if 'memoria' in modos:
+        import tracemalloc
+        tracemalloc.start()
+    if 'flamegraph' in modos:
+        _muestreador = threading.Thread(target=_muestrear, name='perfilado-muestreo', daemon=True)
+        _muestreador.start()
+    atexit.register(reporte)
+
+def _pila_local():
+    if not hasattr(_local, 'pila'):
+        _local.pila = []
+    return _local.pila
+
+@contextlib.contextmanager
+def _medir(nombre):
+    pila = _pila_local()
+    marco = {'hijos': 0.0, 'pico_hijos': 0}
+    ruta = ' > '.join([m['nombre'] for m in pila] + [nombre])
+    marco['nombre'] = nombre
+    memoria = 'memoria' in modos
+    if memoria:
+        import tracemalloc
+        inicio_memoria = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    with _lock:
+        # Registrar al entrar: el reporte respeta el orden de inicio (padres antes que hijos)
+        e = _estadisticas.setdefault(ruta, {'llamadas': 0, 'pared': 0.0, 'propio': 0.0, 'cpu': 0.0, 'pico': 0})
+    pila.append(marco)
+    inicio_cpu = time.thread_time()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        pared = time.perf_counter() - inicio
+        cpu = time.thread_time() - inicio_cpu
+        pila.pop()
+        pico = 0
+        if memoria:
+            pico_absoluto = max(tracemalloc.get_traced_memory()[1], marco['pico_hijos'])
+            pico = max(pico_absoluto - inicio_memoria, 0)
+        if pila:
+            pila[-1]['hijos'] += pared
+            if memoria:
+                pila[-1]['pico_hijos'] = max(pila[-1]['pico_hijos'], pico_absoluto)
+        with _lock:
+            e['llamadas'] += 1
+            e['pared'] += pared
+            e['propio'] += pared - marco['hijos']
+            e['cpu'] += cpu
+            e['pico'] = max(e['pico'], pico)
+
+def etapa(nombre):
+    """
+    Context manager que mide una etapa (anidable). Si el perfilado está
+    desactivado devuelve un contexto vacío compartido.
+    """
+    return _medir(nombre) if ACTIVO else _NULO
+
+@contextlib.contextmanager
+def _capturar(nombre):
+    global _capturas
+    hilo = threading.get_ident()
+    with _lock:
+        _capturas += 1
+        _hilos_capturados[hilo] += 1
+        if _perfilador is not None and _capturas == 1:
+            _perfilador.enable()
+    try:
+        with _medir(nombre):
+            yield
+    finally:
+        with _lock:
+            _capturas -= 1
+            _hilos_capturados[hilo] -= 1
+            if _hilos_capturados[hilo] <= 0:
+                del _hilos_capturados[hilo]
+            if _perfilador is not None and _capturas == 0:
+                _perfilador.disable()
+
+def perfilar(nombre=None):
+    """
+    Decorador para las funciones principales: con el perfilado activo, mide la
+    función como etapa y la captura con cProfile y el muestreo de pilas
+    """
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not ACTIVO:
+                return funcion(*args, **kwargs)
+            with _capturar(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+def _muestrear():
+    """
+    Toma la pila de los hilos que están dentro de una función perfilada cada
+    INTERVALO_MUESTREO segundos (formato de pilas plegadas de flamegraph.pl)
+    """
+    propio = threading.get_ident()
+    while True:
+        time.sleep(INTERVALO_MUESTREO)
+        with _lock:
+            hilos = list(_hilos_capturados)
+        if not hilos:
+            continue
+        marcos = sys._current_frames()
+        for hilo in hilos:
+            marco = marcos.get(hilo)
+            if marco is None or hilo == propio:
+                continue
+            funciones = []
+            while marco is not None:
+                codigo = marco.f_code
+                funciones.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                marco = marco.f_back
+            with _lock:
+                _pilas[';'.join(reversed(funciones))] += 1
+
+def _base_salida():
+    directorio = os.environ.get('BUCARAPI_PERFIL_DIR') or '.'
+    os.makedirs(directorio, exist_ok=True)
+    return os.path.join(directorio, f"perfil_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}")
+
+def reporte():
+    """
+    Imprime la tabla de etapas y escribe los archivos de cProfile y flamegraph
+    """
+    if not _estadisticas:
+        return
+    base = None
+    print(f"\n{'='*96}", file=sys.stderr)
+    print("PERFIL DE EJECUCIÓN", file=sys.stderr)
+    print(f"{'='*96}", file=sys.stderr)
+    print(f"{'Etapa':<52} {'Llamadas':>8} {'Pared (s)':>10} {'Propio (s)':>10} {'CPU (s)':>8}"
+          + (f" {'Pico MB':>8}" if 'memoria' in modos else ''), file=sys.stderr)
+    print(f"{'-'*96}", file=sys.stderr)
+    for ruta, e in _estadisticas.items():
+        nivel = ruta.count(' > ')
+        nombre = '  ' * nivel + ruta.rsplit(' > ', 1)[-1]
+        print(f"{nombre:<52} {e['llamadas']:>8,} {e['pared']:>10.3f} {e['propio']:>10.3f} {e['cpu']:>8.3f}"
+              + (f" {e['pico'] / 1e6:>8.1f}" if 'memoria' in modos else ''), file=sys.stderr)
+
+    if _perfilador is not None:
+        base = base or _base_salida()
+        ruta = f"{base}.prof"
+        _perfilador.dump_stats(ruta)
+        print(f"\n✓ cProfile guardado en: {ruta} (ver con: python -m pstats {ruta})", file=sys.stderr)
+    if 'memoria' in modos:
+        import tracemalloc
+        print("\nMayores asignaciones de memoria vivas:", file=sys.stderr)
+        # Sin las asignaciones de las importaciones ni del propio perfilado
+        ruido = ['<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', __file__, tracemalloc.__file__]
+        if _perfilador is not None:
+            import cProfile
+            ruido.append(cProfile.__file__)
+        instantanea = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, r) for r in ruido])
+        for estadistica in instantanea.statistics('lineno')[:10]:
+            print(f"  {estadistica}", file=sys.stderr)
+    with _lock:
+        pilas = _pilas.most_common()
+    if pilas:
+        base = base or _base_salida()
+        ruta = f"{base}.folded"
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for pila, muestras in pilas:
+                f.write(f"{pila} {muestras}\n")
+        print(f"\n✓ Pilas para flamegraph guardadas en: {ruta} ({sum(m for _, m in pilas):,} muestras; "
+              f"usar con flamegraph.pl o speedscope)", file=sys.stderr)
+
+if os.environ.get('BUCARAPI_PERFIL'):
+    activar(os.environ['BUCARAPI_PERFIL'])
@@ -9,6 +9,10 @@ import pandas as pd
 import sys
 import os
 
+from cache_columnar import leer_cacheado
+from perfilado import etapa, perfilar
+
+@perfilar()
 def exportar_columnas(archivo_entrada, columnas_deseadas, archivo_salida=None):
     """
     Exporta solo las columnas especificadas de un archivo Excel
@@ -29,8 +33,9 @@ def exportar_columnas(archivo_entrada, columnas_deseadas, archivo_salida=None):
     print(f"📁 Archivo de entrada: {archivo_entrada}")
     
     try:
-        # Leer el archivo Excel
-        df = pd.read_excel(archivo_entrada)
+        # Leer el archivo Excel (vía la caché columnar)
+        with etapa('lectura'):
+            df = leer_cacheado(archivo_entrada)
         print(f"✓ Archivo cargado exitosamente")
         print(f"  Total de registros: {len(df):,}")
         print(f"  Total de columnas: {len(df.columns)}")
@@ -93,18 +98,20 @@ def exportar_columnas(archivo_entrada, columnas_deseadas, archivo_salida=None):
             archivo_salida = f"{base}_columnas_seleccionadas.xlsx"
         
         # Guardar archivo
-        with pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
-            df_exportar.to_excel(writer, index=False, sheet_name='Datos')
+        with etapa('openpyxl'), pd.ExcelWriter(archivo_salida, engine='openpyxl') as writer:
+            with etapa('to_excel'):
+                df_exportar.to_excel(writer, index=False, sheet_name='Datos')
             
             # Ajustar ancho de columnas
             worksheet = writer.sheets['Datos']
-            for idx, col in enumerate(df_exportar.columns, 1):
-                max_length = max(
-                    df_exportar[col].astype(str).apply(len).max(),
-                    len(col)
-                ) + 2
-                col_letter = chr(64 + idx) if idx <= 26 else chr(64 + idx // 26) + chr(64 + idx % 26)
-                worksheet.column_dimensions[col_letter].width = min(max_length, 20)
+            with etapa('anchos_columna'):
+                for idx, col in enumerate(df_exportar.columns, 1):
+                    max_length = max(
+                        df_exportar[col].astype(str).apply(len).max(),
+                        len(col)
+                    ) + 2
+                    col_letter = chr(64 + idx) if idx <= 26 else chr(64 + idx // 26) + chr(64 + idx % 26)
+                    worksheet.column_dimensions[col_letter].width = min(max_length, 20)
         
         print(f"\n✓ Archivo exportado exitosamente: {archivo_salida}")
         
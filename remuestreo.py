@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Remuestreo a una frecuencia regular (10 min, horaria, diaria...) y relleno
+de huecos con reglas por variable, vectorizado para varias ciudades
+Fecha: 2025-10-20
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cache_columnar import leer_cacheado
+from utilidades import construir_marca_tiempo, separar_marca_tiempo
+
+# Reglas por variable:
+#   lineal   -> promedio por intervalo e interpolación lineal en los huecos
+#   suma     -> suma por intervalo, los huecos no se rellenan
+#   maximo   -> máximo por intervalo, los huecos no se rellenan
+#   circular -> promedio vectorial (seno/coseno) e interpolación de sus componentes
+#   ffill    -> último valor del intervalo y arrastre hacia adelante
+REGLAS = {
+    'Temperatura': 'lineal',
+    'Presión': 'lineal',
+    'Humedad': 'lineal',
+    'Punto de Rocío': 'lineal',
+    'Precipitación': 'suma',
+    'Nieve': 'lineal',
+    'Dirección Viento': 'circular',
+    'Velocidad Viento': 'lineal',
+    'Ráfaga Viento': 'maximo',
+    'Horas Sol': 'suma',
+    'Condición': 'ffill',
+    'Nubosidad': 'lineal',
+    'Sensación Térmica': 'lineal',
+    'Visibilidad': 'lineal',
+    'Índice UV': 'lineal',
+}
+
+AGREGACION = {'lineal': 'mean', 'suma': 'sum', 'maximo': 'max', 'ffill': 'last'}
+
+def _paso(frecuencia):
+    """
+    Duración de un intervalo ('1h' -> 1 hora; 'h' equivale a '1h')
+    """
+    return pd.Timedelta(frecuencia if frecuencia[:1].isdigit() else f'1{frecuencia}')
+
+def _regla(columna, serie, reglas):
+    if columna in reglas:
+        return reglas[columna]
+    return 'lineal' if pd.api.types.is_numeric_dtype(serie) else 'ffill'
+
+def _vecinos_validos(valido, grupos):
+    """
+    Para cada posición, índice de la observación válida anterior y siguiente
+    dentro de la misma ciudad (-1 si no existe)
+    """
+    posiciones = pd.Series(np.where(valido, np.arange(len(valido)), np.nan))
+    anterior = posiciones.groupby(grupos).ffill().fillna(-1).to_numpy(dtype=np.int64)
+    siguiente = posiciones.groupby(grupos).bfill().fillna(-1).to_numpy(dtype=np.int64)
+    return anterior, siguiente
+
+def _interpolar(x, grupos, max_bins):
+    """
+    Interpolación lineal dentro de cada ciudad sólo en huecos de hasta max_bins intervalos
+    """
+    valido = ~np.isnan(x)
+    anterior, siguiente = _vecinos_validos(valido, grupos)
+    posicion = np.arange(len(x))
+    rellenar = ~valido & (anterior >= 0) & (siguiente >= 0) & (siguiente - anterior - 1 <= max_bins)
+    if not rellenar.any():
+        return x
+    a, s, p = anterior[rellenar], siguiente[rellenar], posicion[rellenar]
+    resultado = x.copy()
+    resultado[rellenar] = x[a] + (x[s] - x[a]) * (p - a) / (s - a)
+    return resultado
+
+def _arrastrar(valores, grupos, max_bins):
+    """
+    Forward-fill dentro de cada ciudad; en huecos internos sólo si miden hasta max_bins
+    intervalos, y al final de la serie hasta max_bins intervalos
+    """
+    valido = pd.notna(valores)
+    anterior, siguiente = _vecinos_validos(valido, grupos)
+    posicion = np.arange(len(valores))
+    hueco = np.where(siguiente >= 0, siguiente - anterior - 1, posicion - anterior)
+    rellenar = ~valido & (anterior >= 0) & (hueco <= max_bins)
+    resultado = valores.copy()
+    resultado[rellenar] = valores[anterior[rellenar]]
+    return resultado
+
+def remuestrear(df, frecuencia='1h', reglas=None, max_hueco='3h'):
+    """
+    Regulariza las series de cada ciudad a la frecuencia indicada
+
+    Args:
+        df (DataFrame): Datos en el formato unificado (Ciudad, Fecha, Hora, variables...)
+        frecuencia (str): Frecuencia de pandas ('10min', '1h', '1D', ...)
+        reglas (dict): Regla por variable (por defecto REGLAS; columnas no listadas
+                       usan 'lineal' si son numéricas y 'ffill' si no)
+        max_hueco (str): Duración máxima de un hueco que se rellena ('3h', '30min', ...)
+
+    Returns:
+        DataFrame: Una fila por ciudad e intervalo, sin huecos de marca de tiempo
+    """
+    reglas = {**REGLAS, **(reglas or {})}
+    paso = _paso(frecuencia)
+    max_bins = int(pd.Timedelta(max_hueco) // paso)
+
+    datos = df.copy()
+    if 'Ciudad' not in datos.columns:
+        datos['Ciudad'] = ''
+    datos['Marca Tiempo'] = construir_marca_tiempo(datos)
+    datos = datos.dropna(subset=['Marca Tiempo'])
+    variables = [c for c in datos.columns if c not in ('Ciudad', 'Fecha', 'Hora', 'Marca Tiempo')]
+    reglas_df = {c: _regla(c, datos[c], reglas) for c in variables}
+
+    # Dirección del viento: promediar como vector unitario
+    agregaciones = {}
+    for c, regla in reglas_df.items():
+        if regla == 'circular':
+            rad = np.deg2rad(pd.to_numeric(datos[c], errors='coerce'))
+            datos[f'_{c}_sen'] = np.sin(rad)
+            datos[f'_{c}_cos'] = np.cos(rad)
+            agregaciones[f'_{c}_sen'] = 'mean'
+            agregaciones[f'_{c}_cos'] = 'mean'
+        else:
+            agregaciones[c] = AGREGACION[regla]
+
+    agrupado = datos.groupby(['Ciudad', pd.Grouper(key='Marca Tiempo', freq=frecuencia)])
+    intervalos = agrupado.agg(agregaciones)
+    for c, regla in reglas_df.items():
+        if regla == 'suma':
+            # Un intervalo sin observaciones es NaN, no 0
+            conteo = agrupado[c].count()
+            intervalos.loc[conteo == 0, c] = np.nan
+
+    # Índice regular completo por ciudad
+    limites = intervalos.reset_index().groupby('Ciudad')['Marca Tiempo'].agg(['min', 'max'])
+    rangos = [pd.date_range(fila['min'], fila['max'], freq=frecuencia) for _, fila in limites.iterrows()]
+    indice = pd.MultiIndex.from_arrays(
+        [np.repeat(limites.index.to_numpy(), [len(r) for r in rangos]),
+         np.concatenate([r.to_numpy() for r in rangos]) if rangos else np.array([], dtype='datetime64[ns]')],
+        names=['Ciudad', 'Marca Tiempo'])
+    intervalos = intervalos.reindex(indice)
+    grupos = pd.factorize(intervalos.index.get_level_values('Ciudad'))[0]
+
+    resultado = pd.DataFrame(index=intervalos.index)
+    for c, regla in reglas_df.items():
+        if regla == 'lineal':
+            resultado[c] = _interpolar(intervalos[c].to_numpy(dtype=np.float64, na_value=np.nan), grupos, max_bins)
+        elif regla == 'circular':
+            sen = _interpolar(intervalos[f'_{c}_sen'].to_numpy(dtype=np.float64), grupos, max_bins)
+            cos = _interpolar(intervalos[f'_{c}_cos'].to_numpy(dtype=np.float64), grupos, max_bins)
+            resultado[c] = np.round(np.rad2deg(np.arctan2(sen, cos)), 0) % 360
+        elif regla == 'ffill':
+            resultado[c] = _arrastrar(intervalos[c].to_numpy(dtype=object), grupos, max_bins)
+        else:
+            resultado[c] = intervalos[c]
+        if regla in ('lineal', 'suma', 'maximo'):
+            resultado[c] = resultado[c].round(2)
+
+    resultado = resultado.reset_index()
+    resultado['Fecha'], resultado['Hora'] = separar_marca_tiempo(resultado['Marca Tiempo'])
+    return resultado[['Ciudad', 'Fecha', 'Hora', *variables]]
+
+def _claves(ciudades, marcas):
+    return pd.MultiIndex.from_arrays([ciudades, marcas])
+
+def remuestrear_incremental(existente, nuevos, frecuencia='1h', reglas=None, max_hueco='3h', crudos=None):
+    """
+    Agrega datos nuevos a una serie ya remuestreada sin recalcular todo el historial.
+    Sólo se recalculan, por ciudad, los intervalos que pueden verse afectados por los
+    nuevos datos: desde max_hueco antes del último intervalo existente o, si los nuevos
+    datos se solapan con la serie, desde max_hueco antes del primer dato nuevo.
+
+    Un intervalo ya agregado que recibe datos nuevos no puede combinarse con su valor
+    agregado (la suma o el promedio contarían dos veces los mismos datos): si los nuevos
+    datos lo cubren por completo se recalcula sólo con ellos; si no (p. ej. el último día
+    abierto al remuestrear a '1D'), se recalcula con sus datos crudos, que deben pasarse
+    en `crudos`, y sin ellos se rechaza la actualización.
+
+    Args:
+        existente (DataFrame): Resultado previo de remuestrear
+        nuevos (DataFrame): Datos crudos nuevos en el formato unificado
+        crudos (DataFrame): Datos crudos ya agregados en `existente` (basta con los de
+                            los últimos intervalos, p. ej. los del intervalo abierto)
+
+    Returns:
+        DataFrame: Serie regular combinada
+
+    Raises:
+        ValueError: Si los nuevos datos caen en parte de un intervalo ya agregado
+                    cuyos datos crudos no están en `crudos`
+    """
+    if existente is None or existente.empty:
+        return remuestrear(nuevos, frecuencia, reglas, max_hueco)
+
+    if 'Ciudad' not in nuevos.columns:
+        nuevos = nuevos.assign(Ciudad='')
+    paso = _paso(frecuencia)
+    margen = pd.Timedelta(max_hueco) + paso
+    marca = construir_marca_tiempo(existente)
+    marca_nueva = construir_marca_tiempo(nuevos)
+    intervalo_nuevo = marca_nueva.dt.floor(frecuencia)
+
+    # Inicio del tramo a recalcular por ciudad
+    limite = marca.groupby(existente['Ciudad']).transform('max') - margen
+    primero = intervalo_nuevo.groupby(nuevos['Ciudad']).min() - margen
+    desde = existente['Ciudad'].map(primero).fillna(limite).clip(upper=limite)
+    cola = existente['Ciudad'].isin(set(nuevos['Ciudad'])) & (marca >= desde)
+
+    # Intervalos existentes que reciben datos nuevos
+    solapado = _claves(existente['Ciudad'], marca).isin(_claves(nuevos['Ciudad'], intervalo_nuevo))
+    if solapado.any():
+        # Cubierto por completo: los nuevos datos empiezan antes del intervalo y terminan
+        # (más su propia resolución) después de él
+        por_ciudad = marca_nueva.groupby(nuevos['Ciudad'])
+        resolucion = por_ciudad.agg(lambda m: m.sort_values().diff().min()).fillna(paso)
+        inicio_nuevo = existente['Ciudad'].map(por_ciudad.min())
+        fin_nuevo = existente['Ciudad'].map(por_ciudad.max() + resolucion)
+        parcial = solapado & ~((inicio_nuevo <= marca) & (fin_nuevo >= marca + paso))
+        if parcial.any():
+            faltantes = _claves(existente['Ciudad'][parcial], marca[parcial])
+            previos = None
+            if crudos is not None:
+                if 'Ciudad' not in crudos.columns:
+                    crudos = crudos.assign(Ciudad='')
+                marca_cruda = construir_marca_tiempo(crudos)
+                en_parcial = _claves(crudos['Ciudad'], marca_cruda.dt.floor(frecuencia)).isin(faltantes)
+                previos = crudos[en_parcial]
+                faltantes = faltantes[~faltantes.isin(
+                    _claves(previos['Ciudad'], marca_cruda[en_parcial].dt.floor(frecuencia)))]
+            if len(faltantes):
+                ciudad, intervalo = faltantes[0]
+                raise ValueError(
+                    f"Los nuevos datos caen en parte de {len(faltantes)} intervalo(s) ya agregado(s) "
+                    f"(p. ej. {ciudad or '-'} {intervalo}) sin sus datos crudos: páselos en `crudos` "
+                    f"o recalcule todo con remuestrear")
+            # Los datos nuevos reemplazan a los crudos con la misma marca de tiempo
+            nuevos = pd.concat([previos, nuevos], ignore_index=True)
+            nuevos = nuevos[~_claves(nuevos['Ciudad'], construir_marca_tiempo(nuevos)).duplicated(keep='last')]
+
+    recalculado = remuestrear(pd.concat([existente[cola & ~solapado], nuevos], ignore_index=True),
+                              frecuencia, reglas, max_hueco)
+    combinado = pd.concat([existente[~cola], recalculado], ignore_index=True)
+    orden = np.lexsort((construir_marca_tiempo(combinado).to_numpy(),
+                        pd.factorize(combinado['Ciudad'])[0]))
+    return combinado.iloc[orden].reset_index(drop=True)
+
+def main():
+    """
+    Función principal
+    """
+    parser = argparse.ArgumentParser(description='Remuestrea y rellena huecos en datos meteorológicos (.xlsx o .csv)')
+    parser.add_argument('archivo', help='Archivo de entrada')
+    parser.add_argument('--frecuencia', default='1h', help="Frecuencia de salida: '10min', '1h', '1D'... (por defecto: 1h)")
+    parser.add_argument('--max-hueco', default='3h', help='Duración máxima de hueco a rellenar (por defecto: 3h)')
+    parser.add_argument('--salida', help='Archivo de salida (.csv o .xlsx)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archivo):
+        print(f"❌ Error: El archivo '{args.archivo}' no existe.")
+        sys.exit(1)
+
+    df = leer_cacheado(args.archivo)
+    resultado = remuestrear(df, args.frecuencia, max_hueco=args.max_hueco)
+
+    variables = [c for c in resultado.columns if c not in ('Ciudad', 'Fecha', 'Hora')]
+    print(f"📁 Archivo: {args.archivo}")
+    print(f"✓ Registros de entrada: {len(df):,}")
+    print(f"✓ Intervalos de salida ({args.frecuencia}): {len(resultado):,}")
+    print(f"✓ Valores faltantes tras el relleno: {int(resultado[variables].isna().sum().sum()):,}")
+
+    salida = args.salida or f"{os.path.splitext(os.path.basename(args.archivo))[0]}_{args.frecuencia}.csv"
+    if salida.lower().endswith('.xlsx'):
+        resultado.to_excel(salida, index=False)
+    else:
+        resultado.to_csv(salida, index=False, encoding='utf-8')
+    print(f"✓ Resultado guardado en: {salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor local que imita el endpoint history.json de WeatherAPI y
+generador de DataFrames sintéticos con el formato de Meteostat (Hourly.fetch)
+Fecha: 2025-10-20
+"""
+
+import json
+import math
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Separación (grados) de las "ubicaciones" sintéticas a las que search.json ajusta las coordenadas
+RESOLUCION_UBICACIONES = 0.05
+
+CONDICIONES = ['Sunny', 'Partly cloudy', 'Cloudy', 'Overcast', 'Patchy rain possible',
+               'Light rain shower', 'Moderate rain', 'Thundery outbreaks possible']
+
+def _semilla(*partes):
+    """
+    Semilla determinista a partir de los parámetros de la consulta
+    """
+    return sum((i + 1) * ord(c) for i, c in enumerate('|'.join(str(p) for p in partes)))
+
+def generar_dia_weatherapi(fecha, lat=7.1193, lon=-73.1227):
+    """
+    Genera una respuesta history.json sintética (24 horas) para una fecha
+
+    Args:
+        fecha (str): Fecha en formato YYYY-MM-DD
+        lat (float): Latitud
+        lon (float): Longitud
+
+    Returns:
+        dict: Respuesta con la misma estructura que WeatherAPI
+    """
+    rng = random.Random(_semilla(fecha, lat, lon))
+    dia = datetime.strptime(fecha, '%Y-%m-%d')
+    base_temp = 22 + 3 * math.sin(dia.timetuple().tm_yday / 365 * 2 * math.pi)
+
+    horas = []
+    for h in range(24):
+        temp = base_temp + 5 * math.sin((h - 9) / 24 * 2 * math.pi) + rng.gauss(0, 0.8)
+        humedad = max(20, min(100, 75 - 2 * (temp - base_temp) + rng.gauss(0, 4)))
+        rocio = temp - (100 - humedad) / 5
+        viento = max(0.0, rng.gauss(8, 3))
+        horas.append({
+            'time': f"{fecha} {h:02d}:00",
+            'temp_c': round(temp, 1),
+            'pressure_mb': round(1013 + rng.gauss(0, 1.5), 1),
+            'humidity': int(humedad),
+            'dewpoint_c': round(rocio, 1),
+            'precip_mm': round(max(0.0, rng.gauss(-0.5, 1.0)), 2),
+            'wind_degree': rng.randrange(0, 360),
+            'wind_kph': round(viento, 1),
+            'gust_kph': round(viento * 1.5, 1),
+            'condition': {'text': rng.choice(CONDICIONES)},
+            'cloud': rng.randrange(0, 101),
+            'feelslike_c': round(temp + rng.gauss(0, 0.5), 1),
+            'vis_km': 10.0,
+            'uv': round(max(0.0, 8 * math.sin((h - 6) / 12 * math.pi)), 1) if 6 <= h <= 18 else 0.0,
+        })
+
+    return {
+        'location': {'name': 'Bucaramanga', 'lat': lat, 'lon': lon},
+        'forecast': {'forecastday': [{'date': fecha, 'hour': horas}]},
+    }
+
+def ubicacion_cercana(lat, lon):
+    """
+    Ubicación sintética más cercana (como search.json): las coordenadas se ajustan
+    a una malla de RESOLUCION_UBICACIONES grados y el id codifica esa celda
+    """
+    fila = round((lat + 90) / RESOLUCION_UBICACIONES)
+    columna = round((lon + 180) / RESOLUCION_UBICACIONES)
+    lat_u = round(fila * RESOLUCION_UBICACIONES - 90, 4)
+    lon_u = round(columna * RESOLUCION_UBICACIONES - 180, 4)
+    return {'id': fila * 10000 + columna, 'name': f"Ubicacion {lat_u:.2f},{lon_u:.2f}",
+            'region': 'Santander', 'country': 'Colombia', 'lat': lat_u, 'lon': lon_u}
+
+def _coordenadas(q):
+    """
+    'lat,lon' o 'id:<id>' (formato de WeatherAPI) -> (lat, lon)
+    """
+    if q.startswith('id:'):
+        fila, columna = divmod(int(q[3:]), 10000)
+        return (round(fila * RESOLUCION_UBICACIONES - 90, 4), round(columna * RESOLUCION_UBICACIONES - 180, 4))
+    lat, lon = (float(x) for x in q.split(','))
+    return lat, lon
+
+def generar_frame_meteostat(n_horas, inicio=datetime(2024, 12, 1), semilla=0):
+    """
+    Genera un DataFrame sintético con el formato de Hourly(...).fetch() de Meteostat
+    (índice 'time' y columnas temp, dwpt, rhum, prcp, snow, wdir, wspd, wpgt, pres, tsun, coco)
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(semilla)
+    tiempo = pd.date_range(inicio, periods=n_horas, freq='h', name='time')
+    hora = tiempo.hour.to_numpy()
+    temp = 22 + 5 * np.sin((hora - 9) / 24 * 2 * np.pi) + rng.normal(0, 0.8, n_horas)
+    rhum = np.clip(75 - 2 * (temp - 22) + rng.normal(0, 4, n_horas), 20, 100)
+    wspd = np.clip(rng.normal(8, 3, n_horas), 0, None)
+
+    return pd.DataFrame({
+        'temp': temp.round(1),
+        'dwpt': (temp - (100 - rhum) / 5).round(1),
+        'rhum': rhum.round(0),
+        'prcp': np.clip(rng.normal(-0.5, 1.0, n_horas), 0, None).round(1),
+        'snow': np.full(n_horas, np.nan),
+        'wdir': rng.integers(0, 360, n_horas).astype(float),
+        'wspd': wspd.round(1),
+        'wpgt': np.where(rng.random(n_horas) < 0.7, np.nan, (wspd * 1.5).round(1)),
+        'pres': (1013 + rng.normal(0, 1.5, n_horas)).round(1),
+        'tsun': np.full(n_horas, np.nan),
+        'coco': rng.integers(1, 10, n_horas).astype(float),
+    }, index=tiempo)
+
+class ManejadorWeatherAPI(BaseHTTPRequestHandler):
+    """
+    Responde a /v1/history.json con días sintéticos y a /v1/search.json con
+    la ubicación sintética más cercana. El comportamiento
+    (latencia, errores, 429) se lee de los atributos del servidor.
+    """
+
+    def do_GET(self):
+        servidor = self.server
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        with servidor.lock:
+            servidor.solicitudes += 1
+            sorteo = servidor.rng.random()
+
+        if servidor.latencia:
+            time.sleep(servidor.latencia)
+
+        if not params.get('key'):
+            return self._responder(401, {'error': {'code': 1002, 'message': 'API key not provided.'}})
+        if url.path.endswith('/search.json'):
+            try:
+                return self._responder(200, [ubicacion_cercana(*_coordenadas(params.get('q', '')))])
+            except ValueError:
+                return self._responder(200, [])
+        if not url.path.endswith('/history.json'):
+            return self._responder(404, {'error': {'code': 1005, 'message': 'API URL is invalid.'}})
+        if sorteo < servidor.tasa_429:
+            return self._responder(429, {'error': {'code': 2007, 'message': 'API key has exceeded calls per month quota.'}})
+        if sorteo < servidor.tasa_429 + servidor.tasa_errores:
+            return self._responder(500, {'error': {'code': 9999, 'message': 'Internal application error.'}})
+
+        try:
+            lat, lon = _coordenadas(params.get('q', '7.1193,-73.1227'))
+            cuerpo = generar_dia_weatherapi(params['dt'], lat, lon)
+        except (KeyError, ValueError):
+            return self._responder(400, {'error': {'code': 1006, 'message': 'No location found matching parameter q'}})
+        self._responder(200, cuerpo)
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, format, *args):
+        # Silenciar el log por solicitud para no distorsionar las mediciones
+        pass
+
+def iniciar_servidor(puerto=0, latencia=0.0, tasa_errores=0.0, tasa_429=0.0, semilla=0):
+    """
+    Inicia el servidor stub en un hilo en segundo plano
+
+    Args:
+        puerto (int): Puerto local (0 = elegir uno libre)
+        latencia (float): Segundos de retardo por solicitud
+        tasa_errores (float): Probabilidad de responder 500
+        tasa_429 (float): Probabilidad de responder 429
+        semilla (int): Semilla para el sorteo de errores
+
+    Returns:
+        tuple: (servidor, url) donde url apunta a /v1/history.json
+    """
+    servidor = ThreadingHTTPServer(('127.0.0.1', puerto), ManejadorWeatherAPI)
+    servidor.daemon_threads = True
+    servidor.latencia = latencia
+    servidor.tasa_errores = tasa_errores
+    servidor.tasa_429 = tasa_429
+    servidor.rng = random.Random(semilla)
+    servidor.lock = threading.Lock()
+    servidor.solicitudes = 0
+
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    host, puerto_real = servidor.server_address
+    return servidor, f"http://{host}:{puerto_real}/v1/history.json"
+
+def main():
+    """
+    Función principal: ejecuta el servidor stub en primer plano
+    """
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    servidor, url = iniciar_servidor(puerto=puerto)
+    print(f"Servidor stub de WeatherAPI escuchando en {url}")
+    print("Presione Ctrl+C para detener.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+if __name__ == "__main__":
+    main()
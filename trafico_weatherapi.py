@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grabación y reproducción del tráfico con WeatherAPI en un log JSONL
+(opcionalmente comprimido con zstd si la ruta termina en .zst)
+Fecha: 2025-10-20
+"""
+
+import io
+import json
+import os
+
+# Sólo se graban respuestas definitivas: 200 (datos) y 400 (día sin datos).
+# 429, 5xx y 401 son transitorias o de configuración; grabarlas reemplazaría
+# una respuesta buena de una grabación anterior de la misma solicitud.
+ESTADOS_GRABADOS = (200, 400)
+
+def _abrir(ruta, modo):
+    """
+    Abre el log en modo texto; si la ruta termina en .zst usa zstandard
+    """
+    if not ruta.endswith('.zst'):
+        return open(ruta, modo, encoding='utf-8')
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Para logs .zst instale el paquete 'zstandard' (pip install zstandard)")
+
+    if modo == 'a':
+        # Cada apertura agrega un frame zstd nuevo; los frames concatenados son válidos
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(ruta, 'ab')), encoding='utf-8')
+    lector = zstandard.ZstdDecompressor().stream_reader(open(ruta, 'rb'), read_across_frames=True)
+    return io.TextIOWrapper(lector, encoding='utf-8')
+
+def clave_solicitud(params):
+    """
+    Clave de una solicitud history.json (sin la API key)
+    """
+    return f"{params.get('q')}|{params.get('dt')}"
+
+class GrabadorTrafico:
+    """
+    Agrega cada par solicitud/respuesta al log (sólo las de ESTADOS_GRABADOS)
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.archivo = _abrir(ruta, 'a')
+        self.grabadas = 0
+
+    def registrar(self, params, response):
+        if response.status_code not in ESTADOS_GRABADOS:
+            return
+        try:
+            cuerpo = response.json()
+        except ValueError:
+            cuerpo = None
+        linea = {
+            'q': params.get('q'),
+            'dt': params.get('dt'),
+            'status': response.status_code,
+            'body': cuerpo,
+        }
+        self.archivo.write(json.dumps(linea, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.grabadas += 1
+
+    def cerrar(self):
+        self.archivo.close()
+
+class RespuestaGrabada:
+    """
+    Respuesta reproducida desde el log con la misma interfaz usada de requests.Response
+    """
+
+    def __init__(self, status_code, cuerpo):
+        self.status_code = status_code
+        self._cuerpo = cuerpo
+
+    def json(self):
+        return self._cuerpo
+
+def cargar_trafico(ruta):
+    """
+    Carga el log completo en memoria
+
+    Returns:
+        dict: clave_solicitud -> RespuestaGrabada (la última grabación de cada clave gana;
+              se ignoran las respuestas transitorias de logs grabados antes de ESTADOS_GRABADOS)
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"El log de tráfico '{ruta}' no existe.")
+
+    trafico = {}
+    with _abrir(ruta, 'r') as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            registro = json.loads(linea)
+            if registro['status'] not in ESTADOS_GRABADOS:
+                continue
+            trafico[clave_solicitud(registro)] = RespuestaGrabada(registro['status'], registro['body'])
+    return trafico
+
+def reproducir_respuesta(trafico, params):
+    """
+    Devuelve la respuesta grabada para los parámetros; si no existe, un 400
+    (el fetcher lo trata como día sin datos)
+    """
+    respuesta = trafico.get(clave_solicitud(params))
+    if respuesta is None:
+        return RespuestaGrabada(400, {'error': {'code': 1006, 'message': 'Solicitud no grabada'}})
+    return respuesta
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Funciones compartidas para trabajar con el formato unificado
+(Ciudad, Fecha dd/mm/YYYY, Hora HH:MM, variables...)
+Fecha: 2025-10-20
+"""
+
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+def cargar_script(nombre_archivo):
+    """
+    Importa un script del repositorio por ruta (admite nombres con guiones)
+    """
+    nombre_modulo = os.path.splitext(nombre_archivo)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(nombre_modulo, os.path.join(DIRECTORIO, nombre_archivo))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def _factorizar_texto(serie):
+    """
+    factorize sobre la columna original; sólo los valores únicos se convierten a texto
+    """
+    codigos, unicos = pd.factorize(serie)
+    return codigos, pd.Index([str(v) for v in unicos], dtype=object)
+
+def _interpretar_fechas(fechas):
+    dias = pd.to_datetime(fechas, format='%d/%m/%Y', errors='coerce')
+    for formato in ('ISO8601', 'mixed'):
+        if not dias.isna().any():
+            break
+        otras = pd.to_datetime(fechas, format=formato, dayfirst=True, errors='coerce')
+        dias = dias.where(dias.notna(), otras)
+    return dias
+
+def construir_marca_tiempo(df):
+    """
+    Combina las columnas Fecha (dd/mm/YYYY) y Hora (HH:MM) en una Serie datetime64.
+    Sólo se interpretan los valores únicos de cada columna (unos pocos miles
+    en años de datos horarios), lo que evita un strptime por fila.
+    Las fechas que no siguen el formato se interpretan como ISO o con dayfirst=True.
+    """
+    codigos_fecha, fechas = _factorizar_texto(df['Fecha'])
+    dias = _interpretar_fechas(fechas)
+
+    codigos_hora, horas = _factorizar_texto(df['Hora'])
+    desfases = pd.to_timedelta(np.where(horas.str.count(':') == 1, horas + ':00', horas), errors='coerce')
+
+    # Código -1 = valor faltante en la columna original
+    valores = (np.append(dias.to_numpy(), np.datetime64('NaT'))[codigos_fecha]
+               + np.append(desfases.to_numpy(), np.timedelta64('NaT'))[codigos_hora])
+    return pd.Series(valores, index=df.index, name='Marca Tiempo')
+
+def separar_marca_tiempo(marca):
+    """
+    Inverso de construir_marca_tiempo: devuelve (Fecha, Hora) como texto.
+    Igual que al construir, sólo se formatean los días y las horas únicos.
+    """
+    dia = marca.dt.floor('D')
+    codigos_dia, dias = pd.factorize(dia)
+    codigos_hora, horas = pd.factorize(marca - dia)
+
+    texto_dias = np.append(pd.DatetimeIndex(dias).strftime('%d/%m/%Y').to_numpy(dtype=object), None)
+    componentes = pd.TimedeltaIndex(horas).components
+    texto_horas = np.append((componentes['hours'].map('{:02d}'.format) + ':' +
+                             componentes['minutes'].map('{:02d}'.format)).to_numpy(dtype=object), None)
+
+    return (pd.Series(texto_dias[codigos_dia], index=marca.index),
+            pd.Series(texto_horas[codigos_hora], index=marca.index))
+
+def leer_tabla(ruta, **kwargs):
+    """
+    Lee un archivo .xlsx o .csv en un DataFrame
+    """
+    if ruta.lower().endswith('.csv'):
+        return pd.read_csv(ruta, **kwargs)
+    return pd.read_excel(ruta, **kwargs)
@@ -7,6 +7,11 @@ import pandas as pd
 import sys
 import os
 
+from cache_columnar import leer_cacheado
+from perfilado import etapa, perfilar
+from variables_derivadas import UNIDADES_DERIVADAS
+
+@perfilar()
 def analizar_fechas_completo(archivo_entrada):
     """
     Analiza los valores únicos de la columna Fecha en un archivo Excel
@@ -26,8 +31,9 @@ def analizar_fechas_completo(archivo_entrada):
     print(f"📁 Archivo: {archivo_entrada}")
     
     try:
-        # Leer el archivo Excel
-        df = pd.read_excel(archivo_entrada)
+        # Leer el archivo Excel (vía la caché columnar)
+        with etapa('lectura'):
+            df = leer_cacheado(archivo_entrada)
         print(f"✓ Archivo cargado exitosamente")
         print(f"  Total de registros: {len(df):,}")
         
@@ -45,12 +51,13 @@ def analizar_fechas_completo(archivo_entrada):
         
         print(f"✓ Columna encontrada: '{columna_fecha}'")
         
-        # Obtener valores únicos de Fecha
-        fechas_unicas = df[columna_fecha].dropna().unique()
-        total_fechas_unicas = len(fechas_unicas)
-        
-        # Contar repeticiones de cada fecha
-        contador_fechas = df[columna_fecha].value_counts().sort_index()
+        with etapa('conteo'):
+            # Obtener valores únicos de Fecha
+            fechas_unicas = df[columna_fecha].dropna().unique()
+            total_fechas_unicas = len(fechas_unicas)
+            
+            # Contar repeticiones de cada fecha
+            contador_fechas = df[columna_fecha].value_counts().sort_index()
         
         # Convertir fechas a datetime para ordenar correctamente
         try:
@@ -181,7 +188,9 @@ def imprimir_unidades(df=None):
         'Nubosidad': '%',
         'Sensación Térmica': '°C',
         'Visibilidad': 'km',
-        'Índice UV': 'índice (adimensional)'
+        'Índice UV': 'índice (adimensional)',
+        # Variables derivadas (opcionales)
+        **UNIDADES_DERIVADAS
     }
 
     print("\n" + "=" * 40)
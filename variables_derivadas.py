@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cálculo vectorizado (NumPy) de variables derivadas sobre las columnas unificadas:
+índice de calor, presión de vapor, depresión del punto de rocío y componentes u/v del viento
+Fecha: 2025-10-20
+"""
+
+import numpy as np
+
+def _columna(df, nombre):
+    """
+    Devuelve la columna como arreglo float64 (NaN para valores faltantes)
+    """
+    return df[nombre].to_numpy(dtype=np.float64, na_value=np.nan)
+
+def presion_saturacion(temp_c):
+    """
+    Presión de vapor de saturación en hPa (fórmula de Magnus, Bolton 1980)
+    """
+    return 6.112 * np.exp(17.67 * temp_c / (temp_c + 243.5))
+
+def indice_calor(temp_c, humedad):
+    """
+    Índice de calor en °C según el algoritmo del NWS (regresión de Rothfusz
+    con los ajustes por humedad baja/alta; fórmula simple de Steadman por debajo de 80 °F)
+    """
+    t = temp_c * 9 / 5 + 32
+    rh = humedad
+
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+
+    hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh
+          - 0.22475541 * t * rh - 6.83783e-3 * t * t
+          - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+          + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+
+    with np.errstate(invalid='ignore'):
+        seco = (rh < 13) & (t >= 80) & (t <= 112)
+        ajuste_seco = (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17)
+        humedo = (rh > 85) & (t >= 80) & (t <= 87)
+        ajuste_humedo = (rh - 85) / 10 * (87 - t) / 5
+    hi = hi - np.where(seco, ajuste_seco, 0) + np.where(humedo, ajuste_humedo, 0)
+
+    resultado = np.where((simple + t) / 2 < 80, simple, hi)
+    return (resultado - 32) * 5 / 9
+
+def _presion_vapor(df):
+    # Preferir el punto de rocío; si falta, usar temperatura y humedad relativa
+    if 'Punto de Rocío' in df.columns:
+        e = presion_saturacion(_columna(df, 'Punto de Rocío'))
+        if {'Temperatura', 'Humedad'}.issubset(df.columns):
+            respaldo = presion_saturacion(_columna(df, 'Temperatura')) * _columna(df, 'Humedad') / 100
+            e = np.where(np.isnan(e), respaldo, e)
+        return e
+    return presion_saturacion(_columna(df, 'Temperatura')) * _columna(df, 'Humedad') / 100
+
+def _componente_viento(df, trig):
+    # Convención meteorológica: la dirección indica de dónde sopla el viento
+    return -_columna(df, 'Velocidad Viento') * trig(np.deg2rad(_columna(df, 'Dirección Viento')))
+
+# nombre -> (alternativas de columnas requeridas, función(df) -> arreglo)
+DERIVADAS = {
+    'Índice de Calor': (
+        [('Temperatura', 'Humedad')],
+        lambda df: indice_calor(_columna(df, 'Temperatura'), _columna(df, 'Humedad'))),
+    'Presión de Vapor': (
+        [('Punto de Rocío',), ('Temperatura', 'Humedad')],
+        _presion_vapor),
+    'Presión de Vapor Saturación': (
+        [('Temperatura',)],
+        lambda df: presion_saturacion(_columna(df, 'Temperatura'))),
+    'Depresión Punto de Rocío': (
+        [('Temperatura', 'Punto de Rocío')],
+        lambda df: _columna(df, 'Temperatura') - _columna(df, 'Punto de Rocío')),
+    'Viento U': (
+        [('Dirección Viento', 'Velocidad Viento')],
+        lambda df: _componente_viento(df, np.sin)),
+    'Viento V': (
+        [('Dirección Viento', 'Velocidad Viento')],
+        lambda df: _componente_viento(df, np.cos)),
+}
+
+UNIDADES_DERIVADAS = {
+    'Índice de Calor': '°C',
+    'Presión de Vapor': 'hPa',
+    'Presión de Vapor Saturación': 'hPa',
+    'Depresión Punto de Rocío': '°C',
+    'Viento U': 'km/h',
+    'Viento V': 'km/h',
+}
+
+def disponibles(df):
+    """
+    Lista las variables derivadas que pueden calcularse con las columnas del DataFrame
+    """
+    return [nombre for nombre, (alternativas, _) in DERIVADAS.items()
+            if any(set(req).issubset(df.columns) for req in alternativas)]
+
+def calcular_derivadas(df, columnas=None, decimales=2):
+    """
+    Agrega variables derivadas al DataFrame. Sólo se calculan las columnas
+    pedidas, de modo que el costo es proporcional a lo que se solicita.
+
+    Args:
+        df (DataFrame): Datos con las columnas unificadas (Temperatura, Humedad, ...)
+        columnas (list): Variables derivadas a calcular (None = todas las disponibles)
+        decimales (int): Redondeo de los resultados (None = sin redondeo)
+
+    Returns:
+        DataFrame: Copia del DataFrame con las columnas derivadas agregadas
+    """
+    if columnas is None:
+        columnas = disponibles(df)
+
+    nuevas = {}
+    for nombre in columnas:
+        if nombre not in DERIVADAS:
+            raise ValueError(f"Variable derivada desconocida: '{nombre}'. "
+                             f"Opciones: {', '.join(DERIVADAS)}")
+        alternativas, funcion = DERIVADAS[nombre]
+        if not any(set(req).issubset(df.columns) for req in alternativas):
+            print(f"⚠️  No se puede calcular '{nombre}': faltan columnas "
+                  f"({' o '.join(', '.join(req) for req in alternativas)})")
+            continue
+        valores = funcion(df)
+        nuevas[nombre] = np.round(valores, decimales) if decimales is not None else valores
+
+    # Asignar todas las columnas juntas evita fragmentar el DataFrame
+    if nuevas:
+        df = df.assign(**nuevas)
+    return df